@@ -1,4 +1,45 @@
 # Get started
-from .abilities import *
-from .rankers import *
-from .tournaments import *
+#
+# The names below are those of the abilities, rankers and tournaments
+# subpackages.  Each subpackage is only imported when one of its names
+# is first used (PEP 562), because scipy is slow to import and short
+# lived scripts may never need most of it.
+
+import sys
+from importlib import import_module
+
+_exports = {
+        'abilities': [ 'standard', 'interactions', 'unpack_ptable' ],
+        'rankers': [ 'PBS_ranker', 'glicko_ranker', 'elo_ranker',
+            'boyd_silk_ranker', 'PBS_batch_ranker', 'glicko_batch_ranker',
+            'boyd_silk_batch_ranker', 'PBS_path' ],
+        'tournaments': [ 'Tournament', 'RandomTournament',
+            'EvenlyDistributedTournament', 'UserDefinedTournament',
+            'TournamentFromHistory', 'SkillsTournament', 'PlayerIndex',
+            'read_csv_log', 'read_pairs_log', 'tournament_from_log' ],
+        }
+
+__all__ = [ name for names in _exports.values() for name in names ]
+
+def __getattr__(name):
+
+    if name in _exports:
+        return import_module('.' + name,__name__)
+
+    for module,names in _exports.items():
+        if name in names:
+            value = getattr(import_module('.' + module,__name__),name)
+            globals()[name] = value
+            return value
+
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__,name))
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+# No module __getattr__ before python 3.7
+if sys.version_info < (3,7):
+    from .abilities import *
+    from .rankers import *
+    from .tournaments import *
@@ -16,31 +16,59 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import numpy as np
-from functools import lru_cache
-from scipy.stats import norm,uniform
 sq2 = np.sqrt(2)
 
-__all__ = ['standard','interactions']
+__all__ = ['standard','interactions','unpack_ptable']
 
-marr = np.MachAr()
+eps = np.finfo(float).eps
+
+# Tables are built and checked in blocks of rows, so that no temporary
+# is bigger than this many bytes
+BLOCK_BYTES = 2**25
 
 class InvalidPtable(Exception):
     pass
 
-def _pbalance(A,B):
+def _default_cdf(x):
+    ''' Win probability at skill difference x: both skills have
+    standard normal noise '''
+
+    # Same as scipy.stats' norm.cdf(x,scale=sq2), but neither slow to
+    # call nor to import
+    from scipy.special import ndtr
+
+    return ndtr(x/sq2)
+
+def _row_blocks(nrows,rowsize,block_bytes=BLOCK_BYTES):
+    ''' Slices of at most block_bytes worth of rows of float64 '''
+
+    step = max(1,block_bytes//(8*max(rowsize,1)))
+    for start in range(0,nrows,step):
+        yield slice(start,min(start + step,nrows))
+
+def _pbalance(A,B,block_bytes=BLOCK_BYTES):
     '''Copy the lower triangular part of B to that of A, 0.5 on the
-    diagonal, and A_ij = 1 - A_ji for i < j'''
+    diagonal, and A_ij = 1 - A_ji for i < j.  B may be A itself'''
 
     assert A.shape == B.shape
-    I = np.indices(A.shape)
-    ltri = I[0] > I[1]
-    utri = I[1] > I[0]
+    n = A.shape[0]
+    cols = np.arange(n)
+
+    if A is not B:
+        for rows in _row_blocks(n,n,block_bytes):
+            ltri = cols[None,:] < cols[rows,None]
+            np.copyto(A[rows],B[rows],where=ltri)
 
-    A[ltri] = B[ltri]
     np.fill_diagonal(A,0.5)
-    A[utri] = 1 - A.T[utri]
 
-def validate_ptable(ptable):
+    # Upper triangle of a block of rows from the lower triangle of
+    # the matching block of columns
+    for rows in _row_blocks(n,n,block_bytes):
+        utri = cols[None,rows.start:] > cols[rows,None]
+        np.copyto(A[rows,rows.start:],1 - A[rows.start:,rows].T,
+                where=utri)
+
+def validate_ptable(ptable,block_bytes=BLOCK_BYTES):
 
     if not isinstance(ptable,np.ndarray):
         raise InvalidPtable
@@ -48,67 +76,128 @@ def validate_ptable(ptable):
     if not ( ptable.shape[-2] == ptable.shape[-1]):
         raise InvalidPtable
 
+    blocks = list(_row_blocks(ptable.shape[0],ptable.shape[0],
+        block_bytes))
+
     # Okay if dummy ptable via UserDefinedTournament
-    if np.isnan(ptable).all():
+    if all( np.isnan(ptable[rows]).all() for rows in blocks ):
         return
 
-    if ( abs( ptable + ptable.T - 1) >= 
-            1.667*marr.eps).all():
-        raise InvalidPtable
+    # Only rejected if no entry at all is balanced
+    for rows in blocks:
+        if not ( abs( ptable[rows] + ptable[:,rows].T - 1) >= 
+                1.667*eps).all():
+            return
+
+    raise InvalidPtable
 
-def standard(skills,cdf=None):
+def standard(skills,cdf=None,packed=False,block_bytes=BLOCK_BYTES):
     ''' Produce of matrix of win probabilities based on the skill levels
-    of the players.  Basically p = cdf(playerA_skill - playerB_skill) '''
+    of the players.  Basically p = cdf(playerA_skill - playerB_skill).
+
+    If *packed* is set only the lower triangle is returned, row by row
+    as a flat array of n(n-1)/2 floats: the rest of the table follows
+    from it (see unpack_ptable) '''
 
     if cdf is None:
-        cdf = norm(scale=sq2).cdf
+        cdf = _default_cdf
+
+    skills = np.asarray(skills)
+    n = len(skills)
+
+    if packed:
+        ptable = np.empty(n*(n-1)//2)
+        for rows in _row_blocks(n,n,block_bytes):
+            block = cdf(np.subtract.outer(skills[rows],skills[:rows.stop]))
+            ltri = np.arange(rows.stop)[None,:] < \
+                    np.arange(rows.start,rows.stop)[:,None]
+            start,stop = _triangular(rows.start),_triangular(rows.stop)
+            ptable[start:stop] = block[ltri]
+        return ptable
+
+    # Only the lower triangle is needed; _pbalance does the rest
+    ptable = np.empty((n,)*2)
+    for rows in _row_blocks(n,n,block_bytes):
+        ptable[rows,:rows.stop] = cdf(np.subtract.outer(skills[rows],
+            skills[:rows.stop]))
+    _pbalance(ptable,ptable,block_bytes)
+
+    validate_ptable(ptable,block_bytes)
 
-    ptable = np.empty((len(skills),)*2)
-    _pbalance(ptable,cdf(np.subtract.outer(skills,skills)))
+    return ptable
 
-    validate_ptable(ptable)
+def _triangular(n):
+    ''' Cells of the lower triangle above row n '''
+    return n*(n-1)//2
+
+def unpack_ptable(packed,block_bytes=BLOCK_BYTES):
+    ''' Full ptable from the packed lower triangle made by
+    standard(..., packed=True) '''
+
+    n = int(round((1 + np.sqrt(1 + 8*len(packed)))/2))
+    assert _triangular(n) == len(packed)
+
+    ptable = np.empty((n,)*2)
+    for rows in _row_blocks(n,n,block_bytes):
+        ltri = np.arange(rows.stop)[None,:] < \
+                np.arange(rows.start,rows.stop)[:,None]
+        block = ptable[rows,:rows.stop]
+        block[ltri] = packed[_triangular(rows.start):
+                _triangular(rows.stop)]
+    _pbalance(ptable,ptable,block_bytes)
 
     return ptable
 
-def interactions(skills,style,a=0.5,cdf=None):
+def interactions(skills,style,a=0.5,cdf=None,rng=None):
     ''' Produce "exotic" win probabilities.  This is mostly for testing
-    robustness of ranking methods '''
-
-    @lru_cache()
-    def assign(i,j):
-        if i <= j: return 0
-        if i == j + 1: return ptable[i,j]
-        return wedge(i,j)
+    robustness of ranking methods.  Uniform variates come from *rng*
+    (a numpy Generator or seed), or from numpy's global random state if
+    it is not given '''
 
     if a < 0:
         raise ValueError("`a' must be a positive number")
 
-    if style == 'ant':
-        def wedge(x,y):
-            A,B = sorted([assign(x-1,y),assign(x,y+1)])
-            return uniform.rvs(B,a*abs(A)+B)
-
-    elif style == 'syn':
-        def wedge(x,y):
-            return assign(x-1,y) + assign(x,y+1) + uniform.rvs(0,a)
-
-    else:
+    if style not in ('ant','syn'):
         raise Exception('We have not yet defined styles other than '\
                 '\'antagonistic\'(\'ant\') and \'synergistic\'(\'syn\')')
 
+    random = np.random.random_sample if rng is None else \
+            np.random.default_rng(rng).random
+
     nplayers = len(skills)
     ptable = np.zeros((nplayers,)*2)
 
-    # TODO Use numpy's index tricks for this?
-    I = np.indices(ptable.shape)
-    ptable[I[0] == I[1] + 1] = np.diff(skills)
-    
-    for ind in np.ndindex(ptable.shape):
-        if ind[0] > ind[1] + 1:
-            ptable[ind] = assign(*ind)
+    # Cell (i,j) below the first subdiagonal is a "wedge" of (i-1,j) and
+    # (i,j+1), which both lie on the subdiagonal above it.  So we can
+    # fill the lower triangle one subdiagonal at a time, the k'th one
+    # being cells (j+k,j).
+    diag = np.diff(skills).astype(float)
+    ptable[np.arange(1,nplayers),np.arange(nplayers-1)] = diag
+
+    # All the uniform variates at once, for subdiagonals 2,3,...
+    sizes = np.arange(nplayers-2,0,-1)
+    draws = np.split(random(sizes.sum()),np.cumsum(sizes)[:-1])
+
+    # Far from the diagonal the wedges can grow past the largest float,
+    # in which case the win probability is simply 1
+    with np.errstate(over='ignore'):
+        for k,u in zip(range(2,nplayers),draws):
+            up,right = diag[:-1],diag[1:]
+
+            if style == 'ant':
+                A,B = np.minimum(up,right),np.maximum(up,right)
+                width = a*abs(A)+B
+                if (width < 0).any():
+                    raise ValueError('Negative interval for \'ant\' '\
+                            'style probabilities')
+                diag = B + width*u
+            else:
+                diag = up + right + a*u
+
+            ptable[np.arange(k,nplayers),np.arange(nplayers-k)] = diag
 
     if cdf is None:
-        cdf = norm(scale=sq2).cdf
+        cdf = _default_cdf
 
     ptable = cdf(ptable)
 
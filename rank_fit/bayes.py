@@ -16,18 +16,24 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import numpy as np
-from scipy.stats import norm
-from functools import lru_cache
+from scipy import sparse
+from .contests import issparse,edges,row_sums,col_sums
+from .kernels import get_kernel,logistic
 sq2 = np.sqrt(2)
 invpi = 1/np.pi
 
 # TODO The interface between the structure here and those of our
 # methods is a mess.  We need to clean this up!
 
-__all__ = ['obj_func', 'jac', 'hessian', 'recipsigmoid', 'drecipsigmoid',
-        'ddrecipsigmoid', 'arctan', 'darctan', 'ddarctan']
+__all__ = ['obj_func', 'jac', 'hessian', 'hessp', 'recipsigmoid', 'drecipsigmoid',
+        'ddrecipsigmoid', 'arctan', 'darctan', 'ddarctan', 'PBSEvaluator']
 
-# Kernel functions
+# Kernel functions.  By default the objective is that of the
+# 'logistic' kernel of rank_fit.kernels, log(recipsigmoid(x)) being
+# -log(F(x)) for the logistic F, and its derivatives are evaluated
+# directly from the log-kernel.  Another kernel can be named with
+# *kernel*, or, as before, func and its derivatives can be given; for
+# these log(func) is used as it stands.
 
 def recipsigmoid(x):
     
@@ -53,47 +59,333 @@ def ddarctan(x):
 
     return -2*x*invpi/(1+x**2)**2
 
-def obj_func(x,outcomes,alpha,func=recipsigmoid):
+# Dense outcomes may carry leading batch dimensions, (B,n,n) with x of
+# shape (B,n), in which case everything is computed per tournament.
+
+def _outer_diff(x):
+    ''' x_i - x_j over the last axis '''
+
+    return x[...,:,None] - x[...,None,:]
+
+def _log_func(func,kernel):
+    ''' log(func), or -logk of the kernel if func isn't given '''
+
+    if func is not None:
+        return lambda d: np.log(func(d))
+
+    logk = get_kernel(kernel).logk
+    return lambda d: -logk(d)
+
+def obj_func(x,outcomes,alpha,func=None,kernel='logistic'):
     ''' Basic function to minimize.  Uses reciprical of sigmoid as kernel.'''
 
-    assert outcomes.shape == (len(x),)*2
     x = np.array(x)
-    return (np.log(func(np.subtract.outer(x,x)))*outcomes).sum() + \
-            alpha*(x**2).sum()
-            
-@lru_cache()
-def _make_frame(n):
+    assert outcomes.shape[-2:] == (x.shape[-1],)*2
+    log_func = _log_func(func,kernel)
+
+    # Only the played pairs contribute when outcomes are sparse
+    if issparse(outcomes):
+        i,j,w = edges(outcomes)
+        return (log_func(x[i] - x[j])*w).sum() + alpha*(x**2).sum()
+
+    return (log_func(_outer_diff(x))*outcomes).sum((-2,-1)) + \
+            alpha*(x**2).sum(-1)
+
+# Derivatives.  Writing W_ij = outcomes_ij*g(x_i - x_j) for the
+# appropriate derivative g of log(func), the sum over all pairs
+# collapses to row and column sums of W:
+#
+#   d/dx_k         = sum_j W_kj - sum_i W_ik
+#   d^2/dx_k dx_l  = delta_kl*(sum_j W_kj + sum_i W_ik) - W_kl - W_lk
+#
+# so nothing bigger than an n x n array is ever needed.  If outcomes
+# is sparse, W is kept sparse with the same pattern and the cost
+# scales with the number of played pairs.
+
+def _weights(x,outcomes,g):
     ''' Helper function for computing Jacobian and Hessian '''
-    # Broadcast magic
-    frame1 = np.broadcast_to(np.eye(n)[...,None],(n,)*3)
-    frame2 = -frame1.transpose(0,2,1)
-    frame = frame1 + frame2
-    return frame
 
-def jac(x,outcomes,alpha,func=recipsigmoid,dfunc=drecipsigmoid):
+    x = np.array(x)
+    assert outcomes.shape[-2:] == (x.shape[-1],)*2
+
+    if issparse(outcomes):
+        i,j,w = edges(outcomes)
+        return x,sparse.coo_matrix((w*g(x[i] - x[j]),(i,j)),
+                shape=outcomes.shape).tocsr()
+
+    return x,outcomes*g(_outer_diff(x))
+
+def jac(x,outcomes,alpha,func=None,dfunc=None,kernel='logistic'):
     ''' The Jacobian of obj_func '''
 
-    lenx = len(x)
-    assert outcomes.shape == (lenx,)*2
-    x = np.array(x)
-    diffs = np.subtract.outer(x,x)
-    ent = dfunc(diffs)/func(diffs)
-    frame = _make_frame(lenx)
+    if func is None and dfunc is None:
+        dlogk = get_kernel(kernel).dlogk
+        g = lambda d: -dlogk(d)
+    else:
+        func = func or recipsigmoid
+        dfunc = dfunc or drecipsigmoid
+        g = lambda d: dfunc(d)/func(d)
 
-    return (outcomes*ent*frame).sum((1,2)) + 2*alpha*x
+    x,W = _weights(x,outcomes,g)
 
-def hessian(x,outcomes,alpha,func=recipsigmoid, dfunc=drecipsigmoid, 
-        ddfunc= ddrecipsigmoid):
+    return row_sums(W) - col_sums(W) + 2*alpha*x
 
-    lenx = len(x)
-    assert outcomes.shape == (lenx,)*2
-    x = np.array(x)
-    n = lenx
-    diffs = np.subtract.outer(x,x)
-    ent = ddfunc(diffs)/func(diffs) -\
-            (dfunc(diffs)/func(diffs))**2
+def _hess_weights(x,outcomes,func,dfunc,ddfunc,kernel):
+
+    if func is None and dfunc is None and ddfunc is None:
+        d2logk = get_kernel(kernel).d2logk
+        return _weights(x,outcomes,lambda d: -d2logk(d))
+
+    func = func or recipsigmoid
+    dfunc = dfunc or drecipsigmoid
+    ddfunc = ddfunc or ddrecipsigmoid
+
+    def g(d):
+        f = func(d)
+        return ddfunc(d)/f - (dfunc(d)/f)**2
+
+    return _weights(x,outcomes,g)
+
+def hessian(x,outcomes,alpha,func=None,dfunc=None,ddfunc=None,
+        kernel='logistic'):
+    ''' The Hessian of obj_func.  Sparse if outcomes is sparse '''
+
+    x,W = _hess_weights(x,outcomes,func,dfunc,ddfunc,kernel)
+    diag = row_sums(W) + col_sums(W) + 2*alpha
+
+    if issparse(W):
+        return (sparse.diags(diag) - W - W.T).tocsr()
+
+    H = -(W + W.swapaxes(-1,-2))
+    ind = np.arange(x.shape[-1])
+    H[...,ind,ind] += diag
+
+    return H
+
+def hessp(x,p,outcomes,alpha,func=None,dfunc=None,ddfunc=None,
+        kernel='logistic'):
+    ''' The product of the Hessian of obj_func with the vector *p*,
+    without forming the Hessian.  Suitable for `hessp' in scipy's
+    `minimize' '''
+
+    x,W = _hess_weights(x,outcomes,func,dfunc,ddfunc,kernel)
+    p = np.asarray(p)
+
+    if issparse(W):
+        Wp = W.dot(p) + W.T.dot(p)
+    else:
+        Wp = (W @ p[...,None])[...,0] + (p[...,None,:] @ W)[...,0,:]
+
+    return (row_sums(W) + col_sums(W) + 2*alpha)*p - Wp
+
+class PBSEvaluator:
+    ''' obj_func, jac, hessian and hessp of one problem, outcomes and
+    alpha being fixed, for use with scipy's `minimize'.  The objective
+    and gradient come from the same pass (fun_and_jac, for jac=True).
+
+    Dense outcomes are worked through a block of rows at a time, in
+    buffers of *block* elements allocated once, using `out=' arguments.
+    So no n x n temporaries are made, and each block stays in cache
+    while it is worked on.  Hessian weights are kept in an n x n
+    buffer, allocated on first use, so that Hessian-vector products at
+    the same point are only a matrix-vector product each.  Sparse
+    outcomes are worked on as one block of played pairs.
+
+    The outcomes and Hessian weights, the only arrays streamed from
+    memory, are held as *dtype*.  With float32 this halves the memory
+    they take and the traffic they cause, while all other work is
+    still done in double precision.  (Hessian-vector products are then
+    single precision.)  Outcomes are counts, so are exact in float32
+    below 2^24. '''
+
+    def __init__(self,outcomes,alpha,kernel='logistic',dtype=np.float64,
+            block=2**16):
+
+        self.alpha = alpha
+        self.kernel = get_kernel(kernel)
+        self.dtype = np.dtype(dtype)
+        n = self.nplayers = outcomes.shape[-1]
+
+        if issparse(outcomes):
+            i,j,w = edges(outcomes)
+            self._pairs = i,j
+            self._w = w.astype(self.dtype)
+            self._blocks = [ slice(0,len(w)) ]
+            shape = w.shape
+        else:
+            assert outcomes.shape == (n,n)
+            self._pairs = None
+            self._w = np.asarray(outcomes,dtype=self.dtype)
+            step = max(1,block//max(n,1))
+            self._blocks = [ slice(k,min(k + step,n)) 
+                    for k in range(0,n,step) ]
+            shape = (min(step,n),n)
+
+        self._buf = [ np.empty(shape) for _ in range(3) ]
+        self._h = None
+        self._hess_x = self._fg_x = None
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self,alpha):
+        # Changing alpha keeps the buffers, e.g. along a path of alphas.
+        # _hess_x and _fg_x are the points at which _h holds the
+        # Hessian weights and _fg the objective and gradient.
+        self._alpha = alpha
+        self._hess_x = self._fg_x = None
+
+    def _diff(self,x,blk,out):
+        ''' x_i - x_j over the pairs of block *blk* into *out* '''
+
+        if self._pairs is None:
+            return np.subtract(x[blk,None],x[None,:],out=out)
+
+        i,j = self._pairs
+        np.take(x,i,out=out)
+        out -= x[j]
+        return out
+
+    def _add_sums(self,blk,W,rows,cols):
+        ''' Add row and column sums of the weights W of block *blk* '''
+
+        if self._pairs is None:
+            rows[blk] += W.sum(1)
+            cols += W.sum(0)
+        else:
+            i,j = self._pairs
+            rows += np.bincount(i,W,self.nplayers)
+            cols += np.bincount(j,W,self.nplayers)
+
+    def _logistic_u(self,D,T):
+        ''' T = 1/(1 + exp(-|D|)) '''
+
+        np.abs(D,out=T)
+        np.negative(T,out=T)
+        with np.errstate(under='ignore'):
+            np.exp(T,out=T)
+        T += 1
+        return np.reciprocal(T,out=T)
+
+    def fun_and_jac(self,x,*args):
+        ''' obj_func and jac at x.  Further arguments, as passed by
+        `minimize', are ignored '''
+
+        x = np.asarray(x,dtype=float)
+        if self._fg_x is not None and np.array_equal(x,self._fg_x):
+            return self._fg
+
+        n = self.nplayers
+        f,rows,cols = 0.,np.zeros(n),np.zeros(n)
+
+        for blk in self._blocks:
+            w = self._w[blk]
+            D,T,S = [ b[:len(w)] for b in self._buf ]
+            self._diff(x,blk,D)
+
+            if self.kernel is logistic:
+                # -log F(d) = -log(u) - min(d,0), u = 1/(1 + exp(-|d|))
+                self._logistic_u(D,S)
+                np.log(S,out=T)
+                T *= w
+                f -= T.sum()
+                np.minimum(D,0,out=T)
+                T *= w
+                f -= T.sum()
+
+                # F'/F = 1 - F(d) = 1/2 + (u - 1/2) sign(-d)
+                np.subtract(S,0.5,out=T)
+                np.negative(D,out=D)
+                np.copysign(T,D,out=T)
+                T += 0.5
+            else:
+                logk,dlogk,_ = self.kernel.fused(D)
+                f -= (logk*w).sum()
+                T[...] = dlogk
+
+            T *= w
+            self._add_sums(blk,T,rows,cols)
+
+        f += self.alpha*(x**2).sum()
+        g = cols - rows + 2*self.alpha*x
+
+        self._fg_x,self._fg = x,(f,g)
+        return f,g
+
+    def fun(self,x,*args):
+        return self.fun_and_jac(x)[0]
+
+    def jac(self,x,*args):
+        return self.fun_and_jac(x)[1]
+
+    def _hess_weights(self,x):
+        ''' -d^2/dd^2 log F(d) times outcomes into _h, and the
+        diagonal of the Hessian '''
+
+        x = np.asarray(x,dtype=float)
+        if self._hess_x is not None and np.array_equal(x,self._hess_x):
+            return
+
+        if self._h is None:
+            self._h = np.empty(self._w.shape,self.dtype)
+
+        n = self.nplayers
+        rows,cols = np.zeros(n),np.zeros(n)
+
+        for blk in self._blocks:
+            w = self._w[blk]
+            D,T = [ b[:len(w)] for b in self._buf[:2] ]
+            self._diff(x,blk,D)
+
+            if self.kernel is logistic:
+                # u(1 - u)
+                self._logistic_u(D,T)
+                np.subtract(1,T,out=D)
+                T *= D
+            else:
+                np.negative(self.kernel.d2logk(D),out=T)
+
+            T *= w
+            self._add_sums(blk,T,rows,cols)
+            self._h[blk] = T
+
+        self._hdiag = rows + cols + 2*self.alpha
+        self._hess_x = x
+
+    def hessp(self,x,p,*args):
+        ''' Product of the Hessian at x with p '''
+
+        self._hess_weights(x)
+        H = self._h
+
+        if self._pairs is None:
+            pd = np.asarray(p,dtype=self.dtype)
+            Wp = (H @ pd).astype(float) + (pd @ H).astype(float)
+        else:
+            i,j = self._pairs
+            n = self.nplayers
+            Wp = np.bincount(i,H*p[j],n) + np.bincount(j,H*p[i],n)
+
+        return self._hdiag*p - Wp
+
+    def hess(self,x,*args):
+        ''' The Hessian at x, in double precision.  Sparse if the
+        outcomes are '''
+
+        self._hess_weights(x)
+        H = self._h
+
+        if self._pairs is not None:
+            n = self.nplayers
+            W = sparse.coo_matrix((H.astype(float),self._pairs),
+                    shape=(n,n)).tocsr()
+            return (sparse.diags(self._hdiag) - W - W.T).tocsr()
 
-    frame = _make_frame(n)
+        hess = H.astype(float)
+        hess += hess.T.copy()
+        np.negative(hess,out=hess)
+        hess[np.diag_indices(self.nplayers)] += self._hdiag
 
-    return np.tensordot(outcomes*ent*frame,frame,((1,2),)*2) - \
-            2*alpha*np.eye(n)
+        return hess
@@ -0,0 +1,140 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+''' Bootstrap uncertainty for PBS and Boyd-Silk ratings.  A replicate
+tournament has as many games as the original, dealt out to the
+(winner, loser) cells by a multinomial draw with the cells' observed
+frequencies.  Replicates are fitted a batch at a time by the batched
+rankers, starting from the ratings of the original tournament, and
+batches are shared out over a process pool '''
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from inspect import signature
+from warnings import catch_warnings,simplefilter,warn
+import numpy as np
+from .abilities._factory import BLOCK_BYTES
+from .contests import edges
+from .rankers import PBS_ranker,PBS_batch_ranker,boyd_silk_ranker,\
+        boyd_silk_batch_ranker
+
+__all__ = [ 'Bootstrap', 'resample_outcomes', 'bootstrap' ]
+
+Bootstrap = namedtuple('Bootstrap',
+        'ratings replicates lower upper rank_probs')
+Bootstrap.__doc__ = ''' Ratings of the original tournament, (B,n)
+ratings of the replicates (nan rows for those which failed), the
+percentile interval of each player's rating, and rank_probs[i,k], the
+fraction of replicates in which player i is k'th best, from 0 '''
+
+_batch_rankers = { PBS_ranker : PBS_batch_ranker,
+        boyd_silk_ranker : boyd_silk_batch_ranker }
+
+def resample_outcomes(outcomes,size,rng=None):
+    ''' (size,n,n) stack of resampled outcomes.  *rng* is a numpy
+    Generator or seed '''
+
+    rng = np.random.default_rng(rng)
+    n = outcomes.shape[0]
+    ind1,ind2,count = edges(outcomes)
+    ngames = count.sum()
+
+    stack = np.zeros((size,n*n),int)
+    if ngames:
+        stack[:,ind1*n + ind2] = rng.multinomial(ngames,count/ngames,
+                size=size)
+
+    return stack.reshape(size,n,n)
+
+def _rank_probs(replicates):
+    ''' rank_probs of Bootstrap, from the fitted replicates '''
+
+    replicates = replicates[np.isfinite(replicates).all(-1)]
+    nrep,n = replicates.shape
+    if not nrep:
+        return np.full((n,n),np.nan)
+
+    ranks = np.empty(replicates.shape,np.intp)
+    np.put_along_axis(ranks,np.argsort(-replicates,-1),np.arange(n),-1)
+
+    return np.bincount((np.arange(n)*n + ranks).ravel(),
+            minlength=n*n).reshape(n,n)/nrep
+
+def _fit_batch(batch_ranker,outcomes,size,seed,batch_kw):
+
+    # One warning for all the batches
+    with catch_warnings():
+        simplefilter('ignore')
+        return batch_ranker(resample_outcomes(outcomes,size,seed),
+                **batch_kw)
+
+def bootstrap(tournament,ranker,*args,nboot=1000,level=0.95,seed=None,
+        batch=None,processes=None,**kwargs):
+    ''' Fit *nboot* bootstrap replicates of *tournament* with *ranker*,
+    PBS_ranker or boyd_silk_ranker, and its *args and **kwargs.  Those
+    which the batched ranker also takes are passed on to it.  Returns
+    a Bootstrap with *level* percentile intervals.  Replicates are
+    dense, *batch* at a time, by default as many as fit in
+    BLOCK_BYTES.  *processes* as for ProcessPoolExecutor, or 1 to work
+    in this process; the replicates depend only on *seed* '''
+
+    if ranker not in _batch_rankers:
+        raise ValueError('No batched version of {}'.format(
+            getattr(ranker,'__name__',ranker)))
+    batch_ranker = _batch_rankers[ranker]
+
+    ratings = ranker(tournament,*args,**kwargs)
+
+    bound = signature(ranker).bind(tournament,*args,**kwargs).arguments
+    params = signature(batch_ranker).parameters
+    batch_kw = { k:v for k,v in bound.items() if k in params and 
+            params[k].kind == params[k].POSITIONAL_OR_KEYWORD }
+    batch_kw.pop('tournaments',None)
+    batch_kw['start'] = ratings
+
+    n = tournament.nplayers
+    if batch is None:
+        batch = max(1,BLOCK_BYTES//(8*n*n))
+
+    sizes = [ min(batch,nboot - start) for start in range(0,nboot,batch) ]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [ (batch_ranker,tournament.outcomes,size,s,batch_kw)
+            for size,s in zip(sizes,seeds) ]
+
+    if processes == 1:
+        fits = [ _fit_batch(*job) for job in jobs ]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            fits = list(pool.map(_fit_batch,*zip(*jobs)))
+
+    replicates = np.concatenate(fits) if fits else np.empty((0,n))
+
+    failed = ~np.isfinite(replicates).all(-1)
+    if failed.any():
+        warn('{} of {} bootstrap replicates failed'.format(failed.sum(),
+            nboot))
+
+    tail = 50*(1 - level)
+    with catch_warnings():
+        # All nan if every replicate failed
+        simplefilter('ignore',RuntimeWarning)
+        lower,upper = np.nanpercentile(replicates,[tail,100 - tail],0)
+
+    return Bootstrap(ratings,replicates,lower,upper,
+            _rank_probs(replicates))
+
+# vim: tw=70
@@ -16,15 +16,123 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import numpy as np
+from .contests import issparse,edges,row_sums
+
+__all__ = ['boyd_silk_update', 'boyd_silk_fit']
 
 def boyd_silk_update(p,outcomes):
     ''' Iteration step in [1] p49 '''
 
-    return outcomes.sum(1)/\
-            ((outcomes + outcomes.T)/\
-            np.add.outer(p,p)).sum(1)
+    p = np.asarray(p)
+
+    if issparse(outcomes):
+        # Sum over played pairs only
+        i,j,ngames = edges(outcomes + outcomes.T)
+        return row_sums(outcomes)/\
+                np.bincount(i,ngames/(p[i] + p[j]),minlength=len(p))
+
+    # Dense outcomes may be a stack of tournaments, (B,n,n) with p (B,n)
+    return outcomes.sum(-1)/\
+            ((outcomes + outcomes.swapaxes(-1,-2))/\
+            (p[...,:,None] + p[...,None,:])).sum(-1)
+
+# The same iteration with the game counts and win totals worked out
+# once, and p kept normalized
+
+class _BoydSilkMap:
+
+    def __init__(self,outcomes):
+
+        self.sparse = issparse(outcomes)
+        self.wins = row_sums(outcomes).astype(float)
+
+        if self.sparse:
+            self.pairs = edges(outcomes + outcomes.T)
+        else:
+            self.ngames = (outcomes + outcomes.T).astype(float)
+
+    def __call__(self,p):
+
+        if self.sparse:
+            i,j,ngames = self.pairs
+            s = np.bincount(i,ngames/(p[i] + p[j]),minlength=len(p))
+        else:
+            s = np.add.outer(p,p)
+            np.divide(self.ngames,s,out=s)
+            s = s.sum(1)
+
+        p = self.wins/s
+        return p/p.sum()
+
+def boyd_silk_fit(outcomes,tol=0.5e-3,iterlimit=10000,accelerate=True):
+    ''' Iterate boyd_silk_update to its fixed point, normalizing p,
+    and (if *accelerate*) with SQUAREM extrapolation [2].  Stops when
+    successive p differ by at most *tol* in L1 norm, or after
+    *iterlimit* updates.
+
+    Returns log(p), the number of updates, and the residual history.
+    Converged if the last residual is at most *tol*.  Players without
+    wins have no finite rating: log(p) is then returned at once with
+    -inf for them and no residuals '''
+
+    F = _BoydSilkMap(outcomes)
+    nplayers = outcomes.shape[0]
+
+    p = np.full(nplayers,1/nplayers)
+    residuals = []
+    nfev = 0
+
+    if not (F.wins > 0).all():
+        with np.errstate(divide='ignore'):
+            return np.log(F.wins/F.wins.sum()),nfev,residuals
+
+    with np.errstate(divide='ignore',invalid='ignore',over='ignore'):
+        while nfev < iterlimit:
+            p1 = F(p)
+            nfev += 1
+            residuals.append(abs(p1 - p).sum())
+            if residuals[-1] <= tol:
+                return np.log(p1),nfev,residuals
+            if not accelerate or nfev == iterlimit:
+                p = p1
+                continue
+
+            p2 = F(p1)
+            nfev += 1
+            residuals.append(abs(p2 - p1).sum())
+            if residuals[-1] <= tol or nfev == iterlimit:
+                return np.log(p2),nfev,residuals
+
+            # SqS3 step length, at least a plain double step, on
+            # log(p), where the extrapolated p stay positive
+            theta = np.log(p)
+            r = np.log(p1) - theta
+            v = np.log(p2) - np.log(p1) - r
+            vnorm = np.sqrt((v**2).sum())
+            a = min(-np.sqrt((r**2).sum())/vnorm,-1) if vnorm > 0 else -1
+
+            ext = theta - 2*a*r + a**2*v
+            ext = np.exp(ext - ext.max())
+            ext /= ext.sum()
+            p3 = F(ext)
+            nfev += 1
+
+            # Fall back to the plain steps unless extrapolation brought
+            # the fixed point residual down
+            if np.isfinite(p3).all() and \
+                    abs(p3 - ext).sum() <= residuals[-1]:
+                p = p3
+            else:
+                p = p2
+
+        return np.log(p),nfev,residuals
 
 # [1] "A Method for Assigning Cardinal Dominance Ranks" 
 #     Robert Boyd and Joan B. Silk, Anim. Behav., 1983, 31, 45-58
+#
+# [2] "Simple and globally convergent methods for accelerating the
+#     convergence of any EM algorithm"
+#     Ravi Varadhan and Christophe Roland, Scand. J. Stat., 2008, 35,
+#     335-353
 # 
 # vim: tw=70
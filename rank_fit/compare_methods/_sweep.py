@@ -0,0 +1,157 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+''' Compare the ranking methods over a grid of simulated tournaments.
+Jobs are spread over a process pool and their results streamed, one
+row per job, into a CSV file '''
+
+import csv
+import time
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor,as_completed
+from scipy.stats import spearmanr
+from rank_fit import rankers,tournaments
+from rank_fit.abilities import standard,interactions
+from rank_fit.rankers import ConvergenceFailure
+
+__all__ = [ 'grid_jobs', 'run_job', 'sweep', 'load_results' ]
+
+FIELDS = [ 'job', 'seed', 'skills', 'ptable', 'tournament', 'ngames',
+        'ranker', 'alpha', 'k', 'converged', 'error', 'spearman',
+        'seconds', 'ratings' ]
+
+def grid_jobs(skills,ptables=('standard','ant','syn'),
+        tourtypes=('RandomTournament','EvenlyDistributedTournament'),
+        ngames=(200,),
+        ranker_names=('PBS_ranker','elo_ranker','glicko_ranker',
+            'boyd_silk_ranker'),
+        alphas=(1e-2,),k=32,replicates=1,seed=0):
+    ''' One job per cell of the grid and ranker.  Alpha is only varied
+    for PBS_ranker.  All rankers in a cell share a seed, so they are
+    compared on the same ptable and tournament '''
+
+    cells = list(itertools.product(range(replicates),
+        [ list(s) for s in skills ],ptables,tourtypes,ngames))
+    seeds = np.random.SeedSequence(seed).spawn(len(cells))
+
+    jobs = []
+    for (_,s,style,tourtype,n),ss in zip(cells,seeds):
+        cell_seed = int(ss.generate_state(1)[0])
+        for name in ranker_names:
+            for alpha in (alphas if name == 'PBS_ranker' else [None]):
+                jobs.append({'job':len(jobs),'seed':cell_seed,
+                    'skills':s,'ptable':style,'tournament':tourtype,
+                    'ngames':n,'ranker':name,'alpha':alpha,
+                    'k':k if name == 'elo_ranker' else None})
+
+    return jobs
+
+def run_job(job):
+    ''' Simulate and rank one cell of the grid '''
+
+    np.random.seed(job['seed'])
+
+    skills = np.array(job['skills'],dtype=float)
+    if job['ptable'] == 'standard':
+        ptable = standard(skills)
+    else:
+        ptable = interactions(skills,job['ptable'])
+
+    tour = getattr(tournaments,job['tournament'])(ptable,job['ngames'],
+            keep_history = job['ranker'] == 'elo_ranker')
+
+    kw = { key:job[key] for key in ('alpha','k') 
+            if job[key] is not None }
+
+    result = dict(job,converged=True,error='',spearman=np.nan)
+
+    start = time.perf_counter()
+    try:
+        ratings = getattr(rankers,job['ranker'])(tour,**kw)
+    except (ConvergenceFailure,FloatingPointError) as e:
+        ratings = np.full(len(skills),np.nan)
+        result['converged'] = False
+        result['error'] = '{}: {}'.format(type(e).__name__,e)
+    result['seconds'] = time.perf_counter() - start
+
+    if result['converged'] and np.ptp(skills) > 0:
+        result['spearman'] = spearmanr(skills,ratings).correlation
+    result['ratings'] = ratings
+
+    return result
+
+def _row(result):
+
+    row = dict(result)
+    for key in ('skills','ratings'):
+        row[key] = ' '.join(map(repr,np.asarray(row[key],dtype=float)))
+
+    return row
+
+def _write(results,f):
+
+    writer = csv.DictWriter(f,FIELDS)
+    writer.writeheader()
+
+    failures = 0
+    for result in results:
+        failures += not result['converged']
+        writer.writerow(_row(result))
+        f.flush()
+
+    return failures
+
+def sweep(jobs,path,max_workers=None):
+    ''' Run *jobs* on a process pool of *max_workers*, or in this
+    process if that is 1, writing each result to the CSV file *path*
+    as it arrives.  Returns the number of jobs whose ranker failed to
+    converge.  Any other error in a job is raised '''
+
+    with open(path,'w',newline='') as f:
+        if max_workers == 1:
+            return _write(map(run_job,jobs),f)
+
+        with ProcessPoolExecutor(max_workers) as pool:
+            return _write(( fut.result() for fut in as_completed(
+                [ pool.submit(run_job,job) for job in jobs ]) ),f)
+
+def load_results(path):
+    ''' Read a sweep's CSV file back as a dict of columns, sorted by
+    job number '''
+
+    with open(path,newline='') as f:
+        rows = sorted(csv.DictReader(f),key=lambda r: int(r['job']))
+
+    columns = {}
+    for key in FIELDS:
+        col = [ r[key] for r in rows ]
+        if key in ('skills','ratings'):
+            columns[key] = [ np.array(c.split(),dtype=float) 
+                    for c in col ]
+        elif key in ('job','seed','ngames'):
+            columns[key] = np.array(col,dtype=int)
+        elif key in ('alpha','k','spearman','seconds'):
+            columns[key] = np.array([ c or 'nan' for c in col ],
+                    dtype=float)
+        elif key == 'converged':
+            columns[key] = np.array([ c == 'True' for c in col ])
+        else:
+            columns[key] = np.array(col)
+
+    return columns
@@ -0,0 +1,154 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+''' Splitting a tournament into the parts of its contest graph which
+have no games between them, so that each can be ranked on its own.
+
+Players i and j are joined if either beat the other.  Within a weakly
+connected component ratings are tied together by the games; between
+components nothing but the prior (PBS's alpha) relates them.  The PBS
+objective is a sum over weak components, so fitting them separately
+gives the same ratings as fitting them jointly, at the cost of k small
+problems instead of one big one.
+
+Without a prior, a maximum likelihood rating exists only if the
+component is also strongly connected: every player has beaten, through
+some chain of wins, every other.  Otherwise some player can be rated
+ever higher to increase the likelihood [1]. '''
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from .contests import issparse
+from .tournaments import UserDefinedTournament
+
+__all__ = [ 'Component', 'components', 'fit_components' ]
+
+Component = namedtuple('Component','players nstrong needs_prior')
+Component.__doc__ = ''' A weakly connected component: its *players*,
+the number *nstrong* of strongly connected components it splits into,
+and whether, for that reason, it *needs_prior* to be rated '''
+
+def _graph(outcomes):
+
+    return outcomes.tocsr() if issparse(outcomes) else \
+            csr_matrix(outcomes)
+
+def components(outcomes):
+    ''' The weakly connected components of the contest graph, largest
+    first '''
+
+    graph = _graph(outcomes)
+    nweak,weak = connected_components(graph,directed=True,
+            connection='weak')
+    nstrong,strong = connected_components(graph,directed=True,
+            connection='strong')
+
+    comps = []
+    order = np.argsort(weak,kind='stable')
+    bounds = np.searchsorted(weak[order],np.arange(nweak + 1))
+    for start,stop in zip(bounds[:-1],bounds[1:]):
+        players = order[start:stop]
+        k = len(np.unique(strong[players]))
+        comps.append(Component(players,k,k > 1))
+
+    comps.sort(key=lambda c: -len(c.players))
+
+    return comps
+
+def _fit_one(ranker,outcomes,history,args,kwargs):
+
+    tour = UserDefinedTournament(outcomes,
+            keep_history=history is not None)
+    if history is not None:
+        tour.history = history
+
+    return np.asarray(ranker(tour,*args,**kwargs),dtype=float)
+
+def fit_components(tournament,ranker,*args,processes=None,**kwargs):
+    ''' Rank each weak component of *tournament* separately with
+    ranker(component_tournament,*args,**kwargs), on a pool of
+    *processes* processes (all cores by default; 1 to work in this
+    process).  *ranker* must be picklable, e.g. one of rank_fit.rankers.
+    The history, if the tournament keeps one, is split too.
+
+    Players who have played nobody are rated 0 without calling the
+    ranker.  Returns the ratings of all players and the list of
+    Components, whose `needs_prior' tells which components have no
+    ratings without a prior.  Note that ratings of different components
+    are not comparable, whatever the ranker does '''
+
+    outcomes = tournament.outcomes
+    if issparse(outcomes):
+        outcomes = outcomes.tocsr()
+    comps = components(outcomes)
+
+    # Each player's number within its component
+    index = np.empty(tournament.nplayers,np.intp)
+    for c in comps:
+        index[c.players] = np.arange(len(c.players))
+
+    history = None
+    if getattr(tournament,'keep_history',False):
+        # Games grouped by component, numbered as in `comps'
+        history = np.asarray(tournament.history).reshape(-1,2)
+        label = np.empty(tournament.nplayers,np.intp)
+        for k,c in enumerate(comps):
+            label[c.players] = k
+        game_comp = label[history[:,0]]
+        order = np.argsort(game_comp,kind='stable')
+        bounds = np.searchsorted(game_comp[order],
+                np.arange(len(comps) + 1))
+
+    ratings = np.zeros(tournament.nplayers)
+    players,jobs = [],[]
+
+    for k,c in enumerate(comps):
+        if len(c.players) < 2:
+            continue
+
+        sub = outcomes[c.players][:,c.players]
+        sub_history = None
+        if history is not None:
+            games = history[order[bounds[k]:bounds[k + 1]]]
+            sub_history = index[games].astype(history.dtype)
+
+        players.append(c.players)
+        jobs.append((ranker,sub,sub_history,args,kwargs))
+
+    if processes == 1 or len(jobs) < 2:
+        results = [ _fit_one(*job) for job in jobs ]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            # Small components are sent a few at a time
+            chunksize = max(1,len(jobs)//(4*(processes or 
+                os.cpu_count() or 1)))
+            results = list(pool.map(_fit_one,*zip(*jobs),
+                chunksize=chunksize))
+
+    for p,r in zip(players,results):
+        ratings[p] = r
+
+    return ratings,comps
+
+# [1] "Solution of a ranking problem from binary comparisons"
+#     L. R. Ford, Jr., Amer. Math. Monthly 64 (1957), no. 8, 28-33
+#
+# vim: tw=70
@@ -0,0 +1,56 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+''' Helpers for outcome matrices.  outcomes[i,j] is the number of
+times player i beat player j, and may be held either as a dense
+array or as a scipy.sparse matrix when most pairs never meet '''
+
+import numpy as np
+from scipy import sparse
+
+__all__ = ['issparse', 'edges', 'row_sums', 'col_sums']
+
+issparse = sparse.issparse
+
+def edges(outcomes):
+    ''' The played cells of an outcomes matrix as three arrays:
+    winners, losers and the number of games won '''
+
+    if issparse(outcomes):
+        coo = outcomes.tocoo()
+        coo.sum_duplicates()
+        return coo.row,coo.col,coo.data
+
+    i,j = np.nonzero(outcomes)
+    return i,j,outcomes[i,j]
+
+def row_sums(outcomes):
+    ''' Number of wins of each player '''
+
+    if issparse(outcomes):
+        return np.asarray(outcomes.sum(1)).ravel()
+
+    return outcomes.sum(-1)
+
+def col_sums(outcomes):
+    ''' Number of losses of each player '''
+
+    if issparse(outcomes):
+        return np.asarray(outcomes.sum(0)).ravel()
+
+    return outcomes.sum(-2)
@@ -15,9 +15,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from bisect import bisect_right
+import numpy as np
 from rank_fit.elo.ab_dict import ab_dict
 
-__all__ = ['ab_fun']
+__all__ = ['ab_fun', 'ab_vec', 'elo_ratings']
+
+# ab_dict compiled once for vectorised lookups
+_breaks = np.array([ _e[0] for _e in ab_dict ])
+_probs = np.array([ _e[1] for _e in ab_dict ])
+
+# Rounds of fewer games than this on average cost more in numpy
+# overhead than they save, so such tournaments are played game by game
+MIN_ROUND = 16
 
 def ab_fun(x):
     ''' Implements Elo-ranking function defined in [1] '''
@@ -31,6 +41,78 @@ def ab_fun(x):
         # This will never happen...
         raise Exception('Bad argument value: %d' % x)
 
+def ab_vec(x):
+    ''' Vectorised version of ab_fun '''
+
+    x = np.asarray(x)
+    # Last breakpoint not greater than |x|, as ab_fun finds it
+    p = _probs[np.searchsorted(_breaks,abs(x),side='right') - 1]
+    return np.where(x >= 0,1 - p,p)
+
+def _rounds(winners,losers,nplayers):
+    ''' Split the games into rounds in which no player appears twice.
+    Each game goes in the round after the last one involving either of
+    its players, so every player still sees their games in order '''
+
+    last = [-1]*nplayers
+    level = []
+    for a,b in zip(winners.tolist(),losers.tolist()):
+        lev = max(last[a],last[b]) + 1
+        last[a] = last[b] = lev
+        level.append(lev)
+
+    level = np.array(level,dtype=int)
+    order = np.argsort(level,kind='stable')
+    return np.split(order,np.cumsum(np.bincount(level))[:-1])
+
+def _elo_games(winners,losers,rank,k):
+    ''' elo_ratings one game at a time, on Python floats '''
+
+    breaks,probs = _breaks.tolist(),_probs.tolist()
+    rank = rank.tolist()
+
+    for a,b in zip(winners.tolist(),losers.tolist()):
+        d = rank[a] - rank[b]
+        p = probs[bisect_right(breaks,abs(d)) - 1]
+        e = k*(1 - p if d >= 0 else p)
+        rank[a] += e
+        rank[b] -= e
+
+    return np.array(rank)
+
+def elo_ratings(winners,losers,nplayers,k,start=None):
+    ''' Elo ratings after the games in which winners[i] beat
+    losers[i], played in order.  Games within a round share no player,
+    so each round is one vectorised update, unless the rounds are too
+    small to be worth it.  Gives the same result as updating game by
+    game with ab_fun '''
+
+    winners = np.asarray(winners,dtype=np.intp)
+    losers = np.asarray(losers,dtype=np.intp)
+    assert winners.shape == losers.shape
+
+    rank = np.zeros(nplayers) if start is None else \
+            np.array(start,dtype=float)
+
+    if not len(winners):
+        return rank
+
+    # No round can have more than nplayers/2 games
+    if nplayers < 2*MIN_ROUND:
+        return _elo_games(winners,losers,rank,k)
+
+    rounds = _rounds(winners,losers,nplayers)
+    if len(winners) < MIN_ROUND*len(rounds):
+        return _elo_games(winners,losers,rank,k)
+
+    for game in rounds:
+        a,b = winners[game],losers[game]
+        d = rank[a] - rank[b]
+        rank[a] += k*ab_vec(d)
+        rank[b] -= k*ab_vec(d)
+
+    return rank
+
 #
 # [1] "Elo-rating as a tool in the sequential estimation of dominance rankings"
 # by Paul C H Albers and Han de Vries Animal Behavior 2001, 61, 489-945
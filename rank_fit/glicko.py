@@ -16,11 +16,20 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import numpy as np
-from warnings import warn,filterwarnings
+from scipy.sparse import coo_matrix
+from .contests import issparse,edges
 
-__all__ = ['glicko_update']
+__all__ = ['glicko_update','GlickoPeriods']
 
-filterwarnings('error',category=RuntimeWarning)
+# q = ln(10)/400
+q = 0.0057564627324851146
+
+# Rating deviation of unrated players
+rd_max = 350.
+
+# Increase of rd**2 per rating period of inactivity.  As suggested in
+# [1], this takes a player's rd from 50 back up to 350 in 100 periods
+c2 = (350.**2 - 50.**2)/100
 
 def glicko_update(r,rd,outcomes):
     ''' See [1] and [2]. Players are assumed to start at 
@@ -38,50 +47,207 @@ def glicko_update(r,rd,outcomes):
 
     assert nplayers == len(rd) == outcomes.shape[0] == outcomes.shape[1]
 
-    # q = ln(10)/400
-    q = 0.0057564627324851146
+    if issparse(outcomes):
+        return _glicko_update_sparse(r,rd,outcomes)
+
+    return _glicko_update_masked(r,rd,outcomes)
+
+def _glicko_update_masked(r,rd,outcomes):
+    ''' As glicko_update for dense outcomes, which may be a stack of
+    tournaments: (B,n,n) with r and rd of shape (B,n).  Players
+    without games are masked out rather than split off '''
+
+    r = np.asarray(r,dtype=float)
+    rd = np.asarray(rd,dtype=float)
 
     # n_j
-    ngames = outcomes + outcomes.T
+    ngames = outcomes + outcomes.swapaxes(-1,-2)
 
-    # g(\sigma^2)^2
     grd2 = 1/(1+3*q**2*rd**2/np.pi**2)
-
-    # g(\sigma^2)
     grd = np.sqrt(grd2)
 
-    # outcomes = sum_k s_ijk
-
-    # E(s|\mu,\mu_j,\sigma_j)
-    E = 1/(1+10**(-grd*np.subtract.outer(r,r)/400))
-
-    # \delta^2
-    with np.errstate(divide='raise'):
-        try: 
-            d2 = 1/(q**2*(ngames*grd2*E*(1-E)).sum(1))
-        # In case of zero divide, non-participants' skill ratings stay the same,
-        # and ranking procedure carried out with others.
-        except FloatingPointError:
-            part= []
-            for i,row in enumerate(ngames):
-                if (row != 0).any():
-                    part.append(i)
-            
-            ix = np.ix_(part,part)
-            tmp = glicko_update(r[part],
-                    rd[part],
-                    outcomes[ix])
-            r[part],rd[part] = tmp
-            return r,rd
-
-    # \sigma'^2
-    new_rd = np.sqrt(1/(1/rd**2 + 1/d2))
-
-    # \mu'
-    new_r = r + q/(1/rd**2 + 1/d2)*(grd*(outcomes - ngames*E)).sum(1)
+    # E(s|\mu,\mu_j,\sigma_j), g(\sigma_j) running over the last axis.
+    # Far apart ratings overflow the power, giving E = 0 as they should
+    with np.errstate(over='ignore'):
+        E = 1/(1+10**(-grd[...,None,:]*
+            (r[...,:,None] - r[...,None,:])/400))
+
+    # Non-participants' skill ratings stay the same.  Their 1/\delta^2
+    # is zero, so nothing is divided by zero for them either.
+    part = ngames.any(-1)
+
+    # 1/\delta^2
+    inv_d2 = q**2*(ngames*grd2[...,None,:]*E*(1-E)).sum(-1)
+
+    score = (grd[...,None,:]*(outcomes - ngames*E)).sum(-1)
+
+    prec = 1/rd**2 + inv_d2
+
+    new_r = np.where(part,r + q/prec*score,r)
+    new_rd = np.where(part,np.sqrt(1/prec),rd)
 
     return new_r,new_rd
 
+def _glicko_update_sparse(r,rd,outcomes):
+    ''' As glicko_update, but summing over played pairs only '''
+
+    r = r.astype(float)
+    rd = rd.astype(float)
+    nplayers = len(r)
+
+    # n_j, one entry per played pair
+    i,j,ngames = edges(outcomes + outcomes.T)
+    wi,wj,wins = edges(outcomes)
+
+    grd2 = 1/(1+3*q**2*rd**2/np.pi**2)
+    grd = np.sqrt(grd2)
+
+    # As in _glicko_update_masked
+    with np.errstate(over='ignore'):
+        E = 1/(1+10**(-grd[j]*(r[i] - r[j])/400))
+
+    # Non-participants' skill ratings stay the same
+    part = np.bincount(i,minlength=nplayers) > 0
+
+    # 1/\delta^2
+    inv_d2 = q**2*np.bincount(i,ngames*grd2[j]*E*(1-E),
+            minlength=nplayers)[part]
+
+    score = np.bincount(wi,grd[wj]*wins,minlength=nplayers) - \
+            np.bincount(i,grd[j]*ngames*E,minlength=nplayers)
+
+    prec = 1/rd[part]**2 + inv_d2
+    r[part] += q/prec*score[part]
+    rd[part] = np.sqrt(1/prec)
+
+    return r,rd
+
+class GlickoPeriods:
+    ''' Glicko ratings over many rating periods, see [1].  Games are
+    grouped into periods of length *period* in time, counting from
+    *origin*; period k holds the games with times in
+    [origin + k*period, origin + (k+1)*period).  Each period updates
+    the players active in it, from outcomes among those players only.
+    Rating deviations of the others are inflated lazily: only when a
+    player next plays, or when ratings are asked for, is rd set to
+
+        min(sqrt(rd**2 + c2*t), 350)
+
+    t being the number of periods since the player last played.  So a
+    period costs time in proportion to its games and active players.
+    The state can be saved and loaded to resume later '''
+
+    def __init__(self,nplayers=0,period=1.,origin=0.,c2=c2):
+        self.period = period
+        self.origin = origin
+        self.c2 = c2
+
+        self.r = np.full(nplayers,1500.)
+        self.rd = np.full(nplayers,rd_max)
+        # Period in which each player last played
+        self.last = np.zeros(nplayers,np.int64)
+        # The next period to be rated
+        self.current = 0
+
+    @property
+    def nplayers(self):
+        return len(self.r)
+
+    def _grow(self,nplayers):
+
+        extra = nplayers - self.nplayers
+        if extra > 0:
+            self.r = np.concatenate((self.r,np.full(extra,1500.)))
+            self.rd = np.concatenate((self.rd,np.full(extra,rd_max)))
+            self.last = np.concatenate((self.last,
+                np.full(extra,self.current,np.int64)))
+
+    def _inflated(self,players,now):
+
+        t = np.maximum(now - self.last[players],0)
+        return np.minimum(np.sqrt(self.rd[players]**2 + self.c2*t),rd_max)
+
+    def rate_period(self,winners,losers):
+        ''' Rate the games of one period, the next one due '''
+
+        winners = np.asarray(winners,np.int64)
+        losers = np.asarray(losers,np.int64)
+        now = self.current
+
+        if winners.size:
+            self._grow(max(winners.max(),losers.max()) + 1)
+
+            # Outcomes among the active players only
+            active,ind = np.unique(np.concatenate((winners,losers)),
+                    return_inverse=True)
+            w,l = np.split(ind.ravel(),2)
+            outcomes = coo_matrix((np.ones(len(w),int),(w,l)),
+                    shape=(len(active),)*2).tocsr()
+
+            r,rd = _glicko_update_sparse(self.r[active],
+                    self._inflated(active,now),outcomes)
+            self.r[active] = r
+            self.rd[active] = rd
+            self.last[active] = now
+
+        self.current = now + 1
+
+    def update(self,winners,losers,times):
+        ''' Rate all the periods up to that of the latest game.  Games
+        of periods already rated are an error '''
+
+        winners = np.asarray(winners,np.int64)
+        losers = np.asarray(losers,np.int64)
+        periods = np.floor((np.asarray(times) - self.origin)/
+                self.period).astype(np.int64)
+
+        if periods.size and periods.min() < self.current:
+            raise ValueError('Games from periods already rated')
+
+        order = np.argsort(periods,kind='stable')
+        periods = periods[order]
+        winners,losers = winners[order],losers[order]
+
+        if not periods.size:
+            return
+
+        # Periods without games only move the clock on, and deviations
+        # are inflated lazily, so they are skipped
+        played,starts = np.unique(periods,return_index=True)
+        for p,start,stop in zip(played,starts,
+                np.r_[starts[1:],len(periods)]):
+            self.current = int(p)
+            self.rate_period(winners[start:stop],losers[start:stop])
+        self.current = int(periods[-1]) + 1
+
+    def ratings(self,now=None):
+        ''' Ratings and rating deviations, the latter inflated up to the
+        start of period *now*, by default the next one due.  Use
+        now=state.current - 1 for the deviations at the end of the
+        last period rated '''
+
+        if now is None:
+            now = self.current
+
+        return self.r.copy(),self._inflated(slice(None),now)
+
+    def save(self,path):
+        np.savez(path,r=self.r,rd=self.rd,last=self.last,
+                current=self.current,period=self.period,
+                origin=self.origin,c2=self.c2)
+
+    @classmethod
+    def load(cls,path):
+        with np.load(path) as saved:
+            state = cls(0,float(saved['period']),float(saved['origin']),
+                    float(saved['c2']))
+            state.r = saved['r']
+            state.rd = saved['rd']
+            state.last = saved['last']
+            state.current = int(saved['current'])
+
+        return state
+
 # [1] http://www.glicko.net/glicko/glicko.pdf
 # 
 # [2] "Parameter estimation in large dynamic paired comparison experiments"
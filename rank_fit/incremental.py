@@ -0,0 +1,126 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+''' Keep the PBS ratings of a growing tournament up to date.  When new
+games arrive the optimization restarts from the previous optimum
+instead of from the origin '''
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from .bayes import jac,_hess_weights
+from .contests import issparse,row_sums,col_sums
+from .rankers import _PBS_minimize,_method_kw
+
+__all__ = ['IncrementalPBS']
+
+class IncrementalPBS:
+    ''' PBS ratings which can be updated with new games and players.
+    The outcomes are dense unless *sparse* is set.  Starting outcomes
+    may be given through *tournament* '''
+
+    def __init__(self,alpha,tournament=None,sparse=False):
+
+        self.alpha = alpha
+        self.sparse = sparse
+
+        if tournament is not None:
+            outcomes = tournament.outcomes
+            # Copied, since games are added in place
+            if sparse:
+                outcomes = coo_matrix(outcomes).tocsr(copy=True)
+            elif issparse(outcomes):
+                outcomes = outcomes.toarray()
+            else:
+                outcomes = np.array(outcomes)
+            self.outcomes = outcomes
+            self.x = np.zeros(tournament.nplayers)
+            self.fit()
+        else:
+            self.outcomes = coo_matrix((0,0),dtype=int).tocsr() \
+                    if sparse else np.zeros((0,0),int)
+            self.x = np.zeros(0)
+
+    @property
+    def nplayers(self):
+        return len(self.x)
+
+    def add_games(self,winners,losers,nplayers=None):
+        ''' Record that winners[i] beat losers[i].  Players are numbered
+        from zero; new numbers (or a larger *nplayers*) add players,
+        whose ratings are estimated by one Newton step from zero. The
+        ratings are not refitted; see `fit' and `update' '''
+
+        winners = np.asarray(winners,dtype=np.intp).ravel()
+        losers = np.asarray(losers,dtype=np.intp).ravel()
+        assert winners.shape == losers.shape
+
+        n = max(self.nplayers,
+                nplayers or 0,
+                winners.max() + 1 if len(winners) else 0,
+                losers.max() + 1 if len(losers) else 0)
+        old = self.nplayers
+
+        if n > old:
+            if self.sparse:
+                self.outcomes.resize((n,n))
+            else:
+                self.outcomes = np.pad(self.outcomes,(0,n - old))
+            self.x = np.r_[self.x,np.zeros(n - old)]
+
+        if self.sparse:
+            games = coo_matrix((np.ones(len(winners),dtype=int),
+                (winners,losers)),shape=(n,n))
+            self.outcomes = (self.outcomes + games).tocsr()
+        else:
+            np.add.at(self.outcomes,(winners,losers),1)
+
+        if n > old:
+            # One Newton step in each new player's rating, holding
+            # everybody else's fixed
+            g = jac(self.x,self.outcomes,self.alpha)[old:]
+            # The Hessian's diagonal, from the kernel weights alone
+            _,W = _hess_weights(self.x,self.outcomes,None,None,None,
+                    'logistic')
+            h = (row_sums(W) + col_sums(W))[old:] + 2*self.alpha
+            self.x[old:] = -g/h
+
+    def fit(self,**method_kw):
+        ''' Re-optimize from the current ratings.  Unless told otherwise
+        (through scipy `minimize' keywords) a trust region Newton method
+        is used, with the Hessian if the outcomes are dense and with
+        Hessian-vector products if they are sparse.  Returns the ratings
+        and raises ConvergenceFailure as PBS_ranker does '''
+
+        if not method_kw:
+            method_kw = _method_kw('trust-krylov',self.outcomes)
+
+        res = _PBS_minimize(self.outcomes,self.alpha,self.x,**method_kw)
+        self.x = res.x
+        self.nit = res.nit
+
+        return self.ratings
+
+    def update(self,winners,losers,nplayers=None,**method_kw):
+        ''' add_games followed by fit '''
+
+        self.add_games(winners,losers,nplayers)
+        return self.fit(**method_kw)
+
+    @property
+    def ratings(self):
+        return self.x.copy()
@@ -0,0 +1,154 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+''' Kernels for the paired comparison models.  A kernel is a win
+probability F(d), d being the difference in skill of winner and loser.
+The models need the log-kernel log F and its first two derivatives,
+which each kernel here evaluates directly, in a numerically stable
+way and with as few calls to exp, log and the like as possible:
+
+    logk(d)    = log F(d)
+    dlogk(d)   = F'(d)/F(d)
+    d2logk(d)  = F''(d)/F(d) - (F'(d)/F(d))**2
+
+fused(d) returns all three from one pass over d. '''
+
+from collections import namedtuple
+import numpy as np
+from scipy.special import expit,log_ndtr,ndtr
+
+__all__ = [ 'Kernel', 'kernels', 'get_kernel', 'logistic', 'probit',
+        'arctan' ]
+
+Kernel = namedtuple('Kernel','name cdf logk dlogk d2logk fused')
+
+sq2 = np.sqrt(2)
+invpi = 1/np.pi
+log_sq2pi = 0.5*np.log(2*np.pi)
+
+# Exponentials may under- or overflow to 0 or inf in the tails, where
+# the results below are still right.  This is not an error even when
+# the caller has asked for floating point errors to raise.
+_tails = dict(over='ignore',under='ignore')
+
+# Logistic: F(d) = 1/(1 + exp(-d)).  With e = exp(-|d|) everything is
+# a rational function of e.  (numpy's exp is quicker than scipy's
+# expit or numpy's logaddexp.)
+
+def _logistic_logk(d):
+    d = np.asarray(d,dtype=float)
+    with np.errstate(**_tails):
+        return np.minimum(d,0) - np.log1p(np.exp(-abs(d)))
+
+def _logistic_dlogk(d):
+    with np.errstate(**_tails):
+        return 1/(1 + np.exp(d))
+
+def _logistic_d2logk(d):
+    with np.errstate(**_tails):
+        e = np.exp(-abs(np.asarray(d,dtype=float)))
+    e /= (1 + e)**2
+    return np.negative(e,out=e)
+
+def _logistic_fused(d):
+    d = np.asarray(d,dtype=float)
+    with np.errstate(**_tails):
+        e = np.exp(-abs(d))
+    inv = 1/(1 + e)
+    return ( np.minimum(d,0) - np.log1p(e),
+            np.where(d >= 0,e*inv,inv),
+            -e*inv**2 )
+
+logistic = Kernel('logistic',expit,_logistic_logk,_logistic_dlogk,
+        _logistic_d2logk,_logistic_fused)
+
+# Probit: F(d) = Phi(d/sqrt(2)), the chance that a player wins if both
+# skills have standard normal noise (see abilities.standard).  The
+# ratio F'/F is taken from logs, so it is finite far into the lower
+# tail where Phi underflows.
+
+def _probit_cdf(d):
+    return ndtr(np.asarray(d)/sq2)
+
+def _probit_logk(d):
+    return log_ndtr(np.asarray(d)/sq2)
+
+def _probit_ratio(z,logk):
+    with np.errstate(**_tails):
+        return np.exp(-0.5*z**2 - log_sq2pi - logk)/sq2
+
+def _probit_dlogk(d):
+    z = np.asarray(d)/sq2
+    return _probit_ratio(z,log_ndtr(z))
+
+def _probit_d2logk(d):
+    return _probit_fused(d)[2]
+
+def _probit_fused(d):
+    z = np.asarray(d,dtype=float)/sq2
+    logk = log_ndtr(z)
+    r = _probit_ratio(z,logk)
+    # F'' = -z/sqrt(2) F'
+    return logk,r,-r*(z/sq2 + r)
+
+probit = Kernel('probit',_probit_cdf,_probit_logk,_probit_dlogk,
+        _probit_d2logk,_probit_fused)
+
+# Arctan: F(d) = 1/2 + arctan(d)/pi = arctan2(1,-d)/pi.  The latter
+# does not cancel for large negative d.
+
+def _arctan_cdf(d):
+    return invpi*np.arctan2(1,-np.asarray(d,dtype=float))
+
+def _arctan_logk(d):
+    return np.log(_arctan_cdf(d))
+
+def _arctan_dlogk(d):
+    d = np.asarray(d,dtype=float)
+    with np.errstate(**_tails):
+        return invpi/((1 + d**2)*_arctan_cdf(d))
+
+def _arctan_d2logk(d):
+    return _arctan_fused(d)[2]
+
+def _arctan_fused(d):
+    d = np.asarray(d,dtype=float)
+    F = _arctan_cdf(d)
+    with np.errstate(**_tails):
+        d2p1 = 1 + d**2
+        r = invpi/(d2p1*F)
+    # F'' = -2d/(1 + d^2) F'
+    return np.log(F),r,-r*(2*d/d2p1 + r)
+
+arctan = Kernel('arctan',_arctan_cdf,_arctan_logk,_arctan_dlogk,
+        _arctan_d2logk,_arctan_fused)
+
+kernels = { k.name:k for k in (logistic,probit,arctan) }
+
+def get_kernel(kernel):
+    ''' A Kernel, given either itself or its name '''
+
+    if isinstance(kernel,Kernel):
+        return kernel
+
+    try:
+        return kernels[kernel]
+    except KeyError:
+        raise ValueError('Unknown kernel {!r}, expected one of {}'.format(
+            kernel,', '.join(kernels)))
+
+# vim: tw=70
@@ -20,18 +20,24 @@ independent comparisons, and fit a maximum likelihood model.  '''
 
 import numpy as np
 from scipy.optimize import minimize
-from scipy.stats import norm
-from functools import partial
+from warnings import warn
+from .kernels import probit,get_kernel
 
 __all__ = [ 'default_kernel', 'default_dkernel', 'default_ddkernel',
         'objfunc', 'jac', 'hess', 'optimize' ]
 
-cdf = norm.cdf
-pdf = norm.pdf
 fac = np.sqrt(2)
+invsq2pi = 1/np.sqrt(2*np.pi)
+
+def pdf(x):
+    return invsq2pi*np.exp(-0.5*x**2)
+
+# The default is the 'probit' kernel of rank_fit.kernels, whose
+# log-kernel and its derivatives are used directly unless other kernel
+# functions are given
 
 def default_kernel(X):
-    return cdf(X/fac)
+    return probit.cdf(X)
 
 def default_dkernel(X):
     return pdf(X/fac)/fac
@@ -39,39 +45,73 @@ def default_dkernel(X):
 def default_ddkernel(X):
     return -X*pdf(X/fac)/fac**3
 
-def objfunc(x,data,kernel=default_kernel):
-    ''' Objective function.  `x0' will be fixed to zero '''
+def objfunc(x,data,kernel=None,logkernel=probit):
+    ''' Objective function.  `x0' will be fixed to zero.  Uses the
+    log-kernel of *logkernel*, a Kernel of rank_fit.kernels or its
+    name, unless *kernel* is given '''
     x = np.r_[0,x]
-    return (-data*np.log(kernel(np.subtract.outer(x,x)))).sum()
+    arg = np.subtract.outer(x,x)
+    logk = np.log(kernel(arg)) if kernel is not None else \
+            get_kernel(logkernel).logk(arg)
+    return (-data*logk).sum()
+
+_objfunc = objfunc
+
+# scipy methods which take a Hessian
+hess_methods = { 'newton-cg', 'dogleg', 'trust-ncg', 'trust-krylov',
+        'trust-exact', 'trust-constr' }
 
-def jac(x,data,kernel=default_kernel,dkernel = default_dkernel):
-    ''' Jacobian for the kernel '''
+# Writing W = data*e for the appropriate e, the derivatives are row and
+# column sums of W (the first row and column belonging to x0, which is
+# held fixed, are dropped at the end)
+
+def jac(x,data,kernel=None,dkernel=None,logkernel=probit):
+    ''' Jacobian for the kernel.  Unless kernel and dkernel are given,
+    that of *logkernel*, a Kernel of rank_fit.kernels or its name '''
     x = np.r_[0,x]
     arg = np.subtract.outer(x,x)
-    ker,dker = kernel(arg),dkernel(arg)
-    e = dker/ker
-    return np.array( [ -(data[i,:]*e[i,:]).sum()
-        + (data[:,i]*e[:,i]).sum() 
-        for i in range(1,len(x)) ] )
-
-def hess(x,data,kernel=default_kernel,dkernel=default_dkernel,
-        ddkernel=default_ddkernel):
-    ''' Hessian for the kernel '''
+    if kernel is None and dkernel is None:
+        W = data*get_kernel(logkernel).dlogk(arg)
+    else:
+        kernel = kernel or default_kernel
+        dkernel = dkernel or default_dkernel
+        W = data*dkernel(arg)/kernel(arg)
+    return (W.sum(0) - W.sum(1))[1:]
+
+def hess(x,data,kernel=None,dkernel=None,ddkernel=None,
+        logkernel=probit):
+    ''' Hessian for the kernel, as for jac '''
     x = np.r_[0,x]
     arg = np.subtract.outer(x,x)
-    ker,dker,ddker = kernel(arg),dkernel(arg),ddkernel(arg)
-    e = ( dker**2/ker - ddker )/ker
-    return np.array( [ [ -data[i,j]*e[i,j] - data[j,i]*e[j,i] \
-            if i != j else \
-            (data[i,:]*e[i,:]).sum() + (data[:,i]*e[:,i]).sum()
-            for j in range(1,len(x)) ] for i in range(1,len(x))] )
+    if kernel is None and dkernel is None and ddkernel is None:
+        W = -data*get_kernel(logkernel).d2logk(arg)
+    else:
+        kernel = kernel or default_kernel
+        dkernel = dkernel or default_dkernel
+        ddkernel = ddkernel or default_ddkernel
+        ker,dker,ddker = kernel(arg),dkernel(arg),ddkernel(arg)
+        W = data*( dker**2/ker - ddker )/ker
+    H = -(W + W.T)
+    H[np.diag_indices(len(x))] += W.sum(1) + W.sum(0)
+    return H[1:,1:]
         
-def optimize(data,objfunc=partial(objfunc,kernel=default_kernel),
+def optimize(data,objfunc=objfunc,
         *args,**kwargs):
-    '''  Use scipy's `minimize' in `optimization' '''
+    '''  Use scipy's `minimize' in `optimization'.  With the default
+    objective the analytic Jacobian is used, and, unless a Hessian is
+    given or the chosen method takes none, the analytic Hessian with
+    Newton-CG by default.  Other objectives are left to scipy's finite
+    differences unless their derivatives are given '''
+
+    if objfunc is _objfunc:
+        kwargs.setdefault('jac',jac)
+        if 'hess' not in kwargs and 'hessp' not in kwargs:
+            method = kwargs.setdefault('method','newton-cg')
+            if isinstance(method,str) and method.lower() in hess_methods:
+                kwargs['hess'] = hess
 
     x0 = np.zeros(len(data)-1)
     res = minimize(objfunc,x0,(data,),*args,**kwargs)
-    print(res)
+    if not res.success:
+        warn(res.message)
     return np.concatenate(([0],res.x))
-
@@ -0,0 +1,176 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+''' Choosing PBS's alpha and Elo's k by cross validation.  The games of
+a tournament are split into folds; each fold in turn is held out, the
+ratings fitted to the other games, and the held out games scored by
+their log-loss, -log of the probability the fitted model gave to the
+winner winning.  Folds are fitted on a process pool. '''
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse import coo_matrix
+from .contests import issparse,edges
+from .kernels import get_kernel
+from .elo.elo import ab_vec,elo_ratings
+from .rankers import PBS_path
+from .tournaments import UserDefinedTournament
+
+__all__ = [ 'CVResult', 'game_folds', 'PBS_log_loss', 'elo_log_loss',
+        'cross_validate_alpha', 'cross_validate_k' ]
+
+CVResult = namedtuple('CVResult','params loss fold_loss best')
+CVResult.__doc__ = ''' The parameters tried, their mean log-loss per
+game over all folds, their log-loss in each fold (one row per fold),
+and the parameter of least mean loss.  Parameters which failed to fit
+in a fold have loss nan there '''
+
+eps = np.finfo(float).eps
+
+def _games(tournament):
+    ''' The (H,2) history, made up from the outcomes if not kept, in
+    which case its order means nothing '''
+
+    if getattr(tournament,'keep_history',False):
+        return np.asarray(tournament.history).reshape(-1,2)
+
+    ind1,ind2,count = edges(tournament.outcomes)
+    return np.repeat(np.column_stack((ind1,ind2)),count,axis=0)
+
+def game_folds(tournament,nfolds=5,by='random',seed=None):
+    ''' Indices into the history of the games of each fold.  With
+    by='random' games are dealt to folds at random; with by='time' each
+    fold is a stretch of consecutive games, in order of the
+    tournament's `times' if it has them and of the history otherwise;
+    ValueError is raised if it keeps no history '''
+
+    ngames = len(_games(tournament))
+
+    if by == 'random':
+        order = np.random.default_rng(seed).permutation(ngames)
+    elif by == 'time':
+        if not getattr(tournament,'keep_history',False):
+            raise ValueError("by='time' needs the tournament's history")
+        times = getattr(tournament,'times',None)
+        order = np.arange(ngames) if times is None else \
+                np.argsort(times,kind='stable')
+    else:
+        raise ValueError("by must be 'random' or 'time'")
+
+    return np.array_split(order,nfolds)
+
+def PBS_log_loss(ratings,games,kernel='logistic'):
+    ''' Total log-loss of (winner, loser) *games* under PBS ratings '''
+
+    ratings = np.asarray(ratings)
+    d = ratings[...,games[:,0]] - ratings[...,games[:,1]]
+    return -get_kernel(kernel).logk(d).sum(-1)
+
+def elo_log_loss(ratings,games):
+    ''' Total log-loss of (winner, loser) *games* under Elo ratings.
+    Elo's table gives certain wins for large gaps, so probabilities are
+    kept above machine epsilon '''
+
+    ratings = np.asarray(ratings)
+    d = ratings[games[:,0]] - ratings[games[:,1]]
+    return -np.log(np.maximum(1 - ab_vec(d),eps)).sum()
+
+def _held_out(outcomes,games):
+    ''' Outcomes less the *games* '''
+
+    n = outcomes.shape[0]
+    held = coo_matrix((np.ones(len(games),dtype=outcomes.dtype),
+        (games[:,0],games[:,1])),shape=(n,n))
+
+    if issparse(outcomes):
+        train = (outcomes - held).tocsr()
+        train.eliminate_zeros()
+        return train
+
+    return outcomes - held.toarray()
+
+def _fit_fold(kind,train,test,params,fit_kw):
+    ''' Log-loss of each parameter on one fold.  *train* is outcomes
+    for PBS and a history for Elo '''
+
+    loss = np.full(len(params),np.nan)
+
+    if kind == 'PBS':
+        path = PBS_path(UserDefinedTournament(train),params,**fit_kw)
+        kernel = fit_kw.get('obj_func_args',{}).get('kernel','logistic')
+        loss[:len(path.ratings)] = PBS_log_loss(path.ratings,test,kernel)
+    else:
+        n = fit_kw['nplayers']
+        for i,k in enumerate(params):
+            loss[i] = elo_log_loss(elo_ratings(train[:,0],train[:,1],n,k),
+                    test)
+
+    return loss
+
+def _cross_validate(kind,params,jobs,ngames,processes):
+
+    if processes == 1:
+        fold_loss = [ _fit_fold(*job) for job in jobs ]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            fold_loss = list(pool.map(_fit_fold,*zip(*jobs)))
+
+    fold_loss = np.array(fold_loss)
+    loss = fold_loss.sum(0)/ngames
+    best = params[np.nanargmin(loss)] if not np.isnan(loss).all() \
+            else None
+
+    return CVResult(params,loss,fold_loss,best)
+
+def cross_validate_alpha(tournament,alphas,nfolds=5,by='random',
+        seed=None,processes=None,**fit_kw):
+    ''' Cross validate PBS_ranker's alpha.  For each fold the whole
+    path of *alphas* is solved by PBS_path, largest alpha first, each
+    solution starting the next.  The training outcomes of a fold are
+    the tournament's outcomes less its held out games.  *fit_kw*, e.g.
+    method or obj_func_args, go to PBS_path; a kernel in obj_func_args
+    is also used for scoring.  *processes* as for ProcessPoolExecutor,
+    or 1 to work in this process '''
+
+    games = _games(tournament)
+    alphas = np.sort(np.asarray(alphas,dtype=float))[::-1]
+    outcomes = tournament.outcomes
+
+    jobs = [ ('PBS',_held_out(outcomes,games[test]),games[test],alphas,
+        fit_kw) for test in game_folds(tournament,nfolds,by,seed) ]
+
+    return _cross_validate('PBS',alphas,jobs,len(games),processes)
+
+def cross_validate_k(tournament,ks,nfolds=5,by='random',seed=None,
+        processes=None):
+    ''' Cross validate elo_ranker's k.  Each fold's ratings come from
+    the rest of the history, in order '''
+
+    games = _games(tournament)
+    ks = np.asarray(ks,dtype=float)
+    fit_kw = {'nplayers':tournament.nplayers}
+
+    jobs = []
+    for test in game_folds(tournament,nfolds,by,seed):
+        train = np.ones(len(games),bool)
+        train[test] = False
+        jobs.append(('elo',games[train],games[test],ks,fit_kw))
+
+    return _cross_validate('elo',ks,jobs,len(games),processes)
+
+# vim: tw=70
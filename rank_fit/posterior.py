@@ -0,0 +1,175 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+''' Uncertainty of PBS ratings under the Laplace approximation.  PBS
+ratings are the mode of the posterior
+
+    exp(-obj_func(x)) ~ prod F(x_i - x_j)^O_ij * exp(-alpha |x|^2)
+
+and near it the posterior is approximately normal with covariance
+H^-1, H the Hessian of obj_func there.  Only the diagonal of H^-1, the
+marginal variances, is worked out.
+
+H = L + 2 alpha I with L the Laplacian of the contest graph, weighted
+by the kernel's curvature.  Since L kills constant vectors, 1/(2 alpha
+n) of every variance is the uncertainty of the mean rating, which only
+the prior decides; the rest is the diagonal of H^-1 on vectors with
+zero mean.  For small tournaments that comes from a dense Cholesky
+factor.  For large ones it is estimated [1] from Rademacher probes v
+with their means taken out:
+
+    diag(H^-1) ~ mean over probes of v * H^-1 v
+
+Each H^-1 v is found by conjugate gradients, preconditioned by the
+diagonal of H, on all the probes at once.  This costs only
+Hessian-vector products, which are cheap when the outcomes are
+sparse.  The estimate's relative error shrinks as 1/sqrt(nprobes). '''
+
+from collections import namedtuple
+from warnings import warn
+import numpy as np
+from .bayes import hessian
+from .contests import issparse
+from .rankers import PBS_ranker,_evaluator
+
+__all__ = [ 'LaplacePosterior', 'laplace_posterior' ]
+
+LaplacePosterior = namedtuple('LaplacePosterior',
+        'ratings variances stderr')
+LaplacePosterior.__doc__ = ''' PBS ratings, their marginal posterior
+variances and standard errors '''
+
+# Largest tournament whose variances are worked out exactly by default
+max_dense = 2000
+
+def _not_definite():
+    return ValueError('The Hessian is not positive definite at the '
+            'ratings, which are then no posterior mode')
+
+def _cholesky_variances(H):
+    ''' diag(H^-1) from H = C C^T: the column sums of squares of C^-1
+    '''
+
+    from scipy.linalg import cholesky,solve_triangular,LinAlgError
+
+    if issparse(H):
+        H = H.toarray()
+
+    try:
+        C = cholesky(H,lower=True)
+    except LinAlgError:
+        raise _not_definite() from None
+    Cinv = solve_triangular(C,np.eye(len(C)),lower=True,
+            overwrite_b=True)
+
+    return (Cinv**2).sum(0)
+
+def _pcg(H,B,tol,maxiter):
+    ''' Solve H X = B, column by column, by conjugate gradients
+    preconditioned with diag(H).  Warns if some column is not solved
+    to relative residual *tol* in *maxiter* iterations '''
+
+    d = H.diagonal()[:,None]
+    if not (d > 0).all():
+        raise _not_definite()
+    X = np.zeros(B.shape)
+    R = B.copy()
+    Z = R/d
+    P = Z.copy()
+    rz = (R*Z).sum(0)
+    bound = tol*np.linalg.norm(B,axis=0)
+
+    # Columns left to converge
+    todo = np.arange(B.shape[1])
+
+    for _ in range(maxiter):
+        Q = H @ P
+        curv = (P*Q).sum(0)
+        if not (curv > 0).all():
+            raise _not_definite()
+        a = rz/curv
+        X[:,todo] += a*P
+        R -= a*Q
+
+        left = np.linalg.norm(R,axis=0) > bound[todo]
+        if not left.all():
+            todo,R,P,rz = todo[left],R[:,left],P[:,left],rz[left]
+        if not len(todo):
+            break
+
+        Z = R/d
+        rz,rz_old = (R*Z).sum(0),rz
+        P *= rz/rz_old
+        P += Z
+    else:
+        warn('Conjugate gradients did not converge for {} of {} probes '
+                'in {} iterations'.format(len(todo),B.shape[1],maxiter))
+
+    return X
+
+def _probe_variances(H,alpha,nprobes,tol,maxiter,rng):
+
+    n = H.shape[0]
+    V = np.random.default_rng(rng).choice([-1.,1.],size=(n,nprobes))
+    V -= V.mean(0)
+
+    return 1/(2*alpha*n) + (V*_pcg(H,V,tol,maxiter)).mean(1)
+
+def laplace_posterior(tournament,alpha,ratings=None,obj_func_args={},
+        solver=None,nprobes=100,tol=1e-6,maxiter=1000,seed=None,
+        **ranker_kw):
+    ''' PBS ratings of *tournament* with their Laplace approximate
+    variances.  The ratings are fitted by PBS_ranker, with
+    *ranker_kw*, unless given.  *solver* is 'cholesky', exact but
+    O(n^3) in time and O(n^2) in memory, or 'probes', which estimates
+    the variances from *nprobes* probes, each solved to relative
+    residual *tol* in at most *maxiter* iterations.  By default
+    'cholesky' is used up to max_dense players.  *seed* is for the
+    probes.  Raises ValueError if the Hessian at the ratings is not
+    positive definite, as it can be for some kernels away from the
+    mode '''
+
+    if not alpha > 0:
+        raise ValueError('The posterior is improper unless alpha > 0')
+
+    n = tournament.nplayers
+    if solver is None:
+        solver = 'cholesky' if n <= max_dense else 'probes'
+    if solver not in ('cholesky','probes'):
+        raise ValueError("solver must be 'cholesky' or 'probes'")
+
+    outcomes = tournament.outcomes
+    if ratings is None:
+        ratings = PBS_ranker(tournament,alpha,obj_func_args=obj_func_args,
+                **ranker_kw)
+    ratings = np.asarray(ratings,dtype=float)
+
+    evaluator = _evaluator(outcomes,alpha,obj_func_args)
+    H = hessian(ratings,outcomes,alpha,**obj_func_args) \
+            if evaluator is None else evaluator.hess(ratings)
+
+    if solver == 'cholesky':
+        variances = _cholesky_variances(H)
+    else:
+        variances = _probe_variances(H,alpha,nprobes,tol,maxiter,seed)
+
+    return LaplacePosterior(ratings,variances,np.sqrt(variances))
+
+# [1] C. Bekas, E. Kokiopoulou and Y. Saad, "An estimator for the
+# diagonal of a matrix", Applied Numerical Mathematics 57 (2007)
+
+# vim: tw=70
@@ -17,44 +17,108 @@
 
 ''' The ranking algorithms considered in our comparisons '''
 
+import time
 import numpy as np
-from .bayes import obj_func,jac
-from scipy.optimize import minimize
-from warnings import warn,filterwarnings
+from collections import namedtuple
+from .bayes import obj_func,jac,hessian,hessp,PBSEvaluator
+from warnings import warn
 from functools import partial
-from .elo.elo import ab_fun
-from .glicko import glicko_update
-from .boyd_silk import boyd_silk_update
+from .elo.elo import elo_ratings
+from .glicko import glicko_update,_glicko_update_masked,GlickoPeriods
+from .boyd_silk import boyd_silk_fit
+from .contests import issparse,row_sums,col_sums
 
 __all__ = [ 'PBS_ranker', 'glicko_ranker', 'elo_ranker',
-        'boyd_silk_ranker' ]
+        'boyd_silk_ranker', 'PBS_batch_ranker', 'glicko_batch_ranker',
+        'boyd_silk_batch_ranker', 'PBS_path' ]
 
 class ConvergenceFailure(Exception):
     pass
 
-def PBS_ranker(tournament,alpha,start = None,obj_func_args={},*args,**kwargs):
-    '''Generate the rankings based on a series of games and a starting value
-    '''
-    
-    # Start optimization at origin by default
-    # ( got any better ideas? )
-    if start is None: 
-        start = np.zeros(tournament.nplayers)
+def _kernel_partials(obj_func_args):
+    ''' obj_func, jac, hessian and hessp with the kernel in
+    *obj_func_args*: either 'kernel', a name or Kernel of
+    rank_fit.kernels, or the kernel functions themselves.  A derivative
+    only takes the kernel functions over when all the functions it
+    needs are given '''
+
+    def given(*names):
+        kw = { k:obj_func_args[k] for k in ('kernel',) 
+                if k in obj_func_args }
+        if all(k in obj_func_args for k in names):
+            kw.update({ k:obj_func_args[k] for k in names })
+        return kw
+
+    second = given('func','dfunc','ddfunc')
+
+    return ( partial(obj_func,**given('func')),
+            partial(jac,**given('func','dfunc')),
+            partial(hessian,**second),
+            partial(hessp,**second) )
+
+# Methods of scipy's `minimize' which use second derivatives
+_newton_methods = ( 'newton-cg', 'trust-ncg', 'trust-krylov',
+        'trust-exact' )
+
+def _method_kw(method,outcomes,obj_func_args={}):
+    ''' Keywords for `minimize' with the given method.  Newton type
+    methods get the analytic Hessian, or only Hessian-vector products
+    if outcomes is sparse '''
+
+    if method is None:
+        return {}
+
+    method_kw = {'method':method}
+    if method.lower() not in _newton_methods:
+        return method_kw
+
+    _,_,hess_f,hessp_f = _kernel_partials(obj_func_args)
+
+    if not issparse(outcomes):
+        method_kw['hess'] = hess_f
+    elif method.lower() == 'trust-exact':
+        raise ValueError('trust-exact needs dense outcomes')
+    else:
+        method_kw['hessp'] = hessp_f
 
-    outcomes = tournament.outcomes
+    return method_kw
 
-    obj_f = partial(obj_func,func=obj_func_args['func']) \
-            if obj_func_args else obj_func
+def _evaluator(outcomes,alpha,obj_func_args={},dtype=None):
+    ''' A PBSEvaluator for the problem, or None if kernel functions are
+    given in *obj_func_args* '''
 
-    if 'hess' in kwargs:
-        method_kw = {'method':'newton-cg'}
-    else:
-        method_kw = {}
+    if { 'func', 'dfunc', 'ddfunc' } & set(obj_func_args):
+        if dtype is not None:
+            raise ValueError('dtype needs a kernel, not kernel functions')
+        return None
+
+    return PBSEvaluator(outcomes,alpha,
+            obj_func_args.get('kernel','logistic'),dtype or np.float64)
+
+def _PBS_minimize(outcomes,alpha,start,obj_func_args={},dtype=None,
+        evaluator=None,**method_kw):
+    ''' Minimize obj_func from *start*, returning scipy's result.
+    Unless kernel functions are given in *obj_func_args*, the work is
+    done by a PBSEvaluator (made here unless given as *evaluator*),
+    storing outcomes as *dtype*, which also takes over the Hessian of
+    `_method_kw' '''
+
+    # scipy.optimize is slow to import, so only when first needed
+    from scipy.optimize import minimize
+
+    obj_f,jac_f,_,_ = _kernel_partials(obj_func_args)
+    fun,args = obj_f,(outcomes,alpha)
+
+    ev = evaluator or _evaluator(outcomes,alpha,obj_func_args,dtype)
+    if ev is not None:
+        fun,args,jac_f = ev.fun_and_jac,(),True
+        for k,f in (('hess',hessian),('hessp',hessp)):
+            if getattr(method_kw.get(k),'func',None) is f:
+                method_kw[k] = getattr(ev,k)
 
     try:
         with np.errstate(all='raise'):
-            res = minimize(obj_f,start,(outcomes,alpha),jac=jac, 
-                            **method_kw)
+            res = minimize(fun,start,args,jac=jac_f,**method_kw)
 
     except FloatingPointError as e:
         raise ConvergenceFailure(e)
@@ -62,11 +126,95 @@ def PBS_ranker(tournament,alpha,start = None,obj_func_args={},*args,**kwargs):
     if not res.success:
         raise ConvergenceFailure('Convergence failure: '+res.message)
 
-    return res.x
+    return res
+
+def PBS_ranker(tournament,alpha,start = None,obj_func_args={},
+        method = None,dtype = None,*args,**kwargs):
+    '''Generate the rankings based on a series of games and a starting value.
+
+    *method* is passed to scipy's `minimize', BFGS being the default.
+    With 'newton-cg', 'trust-ncg', 'trust-krylov' or 'trust-exact' the
+    analytic Hessian is used.  These converge in far fewer iterations
+    on large tournaments.  With *dtype* float32 the outcomes and the
+    Hessian are held in single precision (see bayes.PBSEvaluator).  '''
+    
+    # Start optimization at origin by default
+    # ( got any better ideas? )
+    if start is None: 
+        start = np.zeros(tournament.nplayers)
+
+    # Kept for backward compatibility
+    if method is None and 'hess' in kwargs:
+        method = 'newton-cg'
+
+    outcomes = tournament.outcomes
+
+    return _PBS_minimize(outcomes,alpha,start,obj_func_args,dtype,
+            **_method_kw(method,outcomes,obj_func_args)).x
+
+PBSPath = namedtuple('PBSPath','alphas ratings nit seconds failure')
 
-def glicko_ranker(tournament,*args,**kwargs):
+def PBS_path(tournament,alphas,start=None,obj_func_args={},method=None,
+        dtype=None):
+    ''' PBS_ranker for each of *alphas*, from the largest to the
+    smallest.  Large alphas make the problem strongly convex and quick
+    to solve, and each solution is the start for the next alpha, so
+    the whole path costs little more than its last point.
+
+    Returns a PBSPath: the alphas in decreasing order, a row of ratings
+    for each, and the iterations and seconds each took.  The path stops
+    at the first ConvergenceFailure, whose message is kept as
+    `failure' (None if there was none); the rows before it are kept,
+    so there may be fewer rows than alphas '''
+
+    alphas = np.sort(np.asarray(alphas,dtype=float))[::-1]
     outcomes = tournament.outcomes
+
+    x = np.zeros(tournament.nplayers) if start is None else \
+            np.asarray(start,dtype=float)
+
+    method_kw = _method_kw(method,outcomes,obj_func_args)
+    ev = _evaluator(outcomes,alphas[0],obj_func_args,dtype) \
+            if len(alphas) else None
+
+    ratings,nit,seconds = [],[],[]
+    failure = None
+
+    for alpha in alphas:
+        if ev is not None:
+            ev.alpha = alpha
+
+        t = time.perf_counter()
+        try:
+            res = _PBS_minimize(outcomes,alpha,x,obj_func_args,
+                    evaluator=ev,**method_kw)
+        except ConvergenceFailure as e:
+            failure = str(e)
+            break
+
+        x = res.x
+        ratings.append(x)
+        nit.append(res.get('nit',0))
+        seconds.append(time.perf_counter() - t)
+
+    return PBSPath(alphas,np.array(ratings).reshape(-1,len(x)),
+            np.array(nit,dtype=int),np.array(seconds),failure)
+
+def glicko_ranker(tournament,period=None,*args,**kwargs):
+    ''' Glicko ratings after a single rating period holding all the
+    games.  If *period* is given, the games are instead rated period by
+    period, as grouped by the tournament's `times' (see GlickoPeriods),
+    which needs a tournament with history and times '''
+
     nplayers = tournament.nplayers
+
+    if period is not None:
+        state = GlickoPeriods(nplayers,period)
+        history = np.asarray(tournament.history).reshape(-1,2)
+        state.update(history[:,0],history[:,1],tournament.times)
+        return state.r
+
+    outcomes = tournament.outcomes
     r,_ = glicko_update([1500]*nplayers,[350]*nplayers,outcomes)
 
     return r
@@ -74,33 +222,24 @@ def glicko_ranker(tournament,*args,**kwargs):
 def elo_ranker(tournament,k,use_pretourn_scores=False):
 
     nplayers = tournament.nplayers
-    rank = np.zeros(tournament.nplayers)
 
     if use_pretourn_scores:
         outcomes = tournament.outcomes
         assert (nplayers,)*2 == outcomes.shape
         # We are assuming that pre-tournaments scores are all equal.
         # So the weight for _any_ individual contest will be 0.5
-        return 0.5*k*(outcomes.sum(1) - outcomes.sum(0))
+        return 0.5*k*(row_sums(outcomes) - col_sums(outcomes))
 
     if not hasattr(tournament,'history'):
         raise Exception('Elo ranking requires tournament history')
 
-    history = tournament.history
-
-    for a,b in history:
-        # Recall that *a* beat *b*
+    # Rows are (winner, loser)
+    history = np.asarray(tournament.history,dtype=np.intp).reshape(-1,2)
 
-        d = rank[a] - rank[b]
-
-        # Update ranking
-        rank[a] += k*ab_fun(d)
-        rank[b] -= k*ab_fun(d)
-
-    return rank
+    return elo_ratings(history[:,0],history[:,1],nplayers,k)
 
 def boyd_silk_ranker(tournament,tol = 0.5e-3,
-        iterlimit=10000,*args,**kwargs):
+        iterlimit=10000,accelerate=True,*args,**kwargs):
     ''' We use the algorithm defined in [1] to rank the players '''
 
     # [1] has a weird recommended start.  To quote:
@@ -114,31 +253,172 @@ def boyd_silk_ranker(tournament,tol = 0.5e-3,
     # prior in mind?  Befuddled, I set them all equal to
     # 1/tournament.nplayers.
 
-    nplayers = tournament.nplayers
-    p = np.array([1/tournament.nplayers]*nplayers)
+    # p49 in [1], with acceleration; see boyd_silk_fit
+    res,_,residuals = boyd_silk_fit(tournament.outcomes,tol,iterlimit,
+            accelerate)
+
+    if not residuals:
+        raise ConvergenceFailure('Players without wins')
+    if residuals[-1] > tol:
+        raise ConvergenceFailure('Iteration limit exceeded')
+
+    # Find Ds as per formula (2) on p48 in [1], but with our
+    # modification that the mean is zero and higher => better
+    return res - res.mean()
+
+# Batched versions of the rankers above.  Each takes either a stack of
+# outcomes matrices, (B,n,n), or a list of tournaments with the same
+# number of players, and returns a (B,n) array of ratings.  Rather
+# than raising ConvergenceFailure, tournaments which could not be
+# fitted get a row of nan, and a warning is issued.
+
+def _stack_outcomes(tournaments):
+
+    if isinstance(tournaments,np.ndarray):
+        outcomes = tournaments
+    else:
+        outcomes = np.stack([ t.outcomes.toarray() 
+            if issparse(t.outcomes) else t.outcomes 
+            for t in tournaments ])
+
+    if outcomes.ndim != 3 or outcomes.shape[1] != outcomes.shape[2]:
+        raise ValueError('Expected a (B,n,n) stack of outcomes')
+
+    return outcomes
+
+def _flag_failures(ratings,failed,ranker):
+
+    if failed.any():
+        ratings[failed] = np.nan
+        warn('{} failed for {} of {} tournaments'.format(ranker,
+            failed.sum(),len(failed)))
+
+    return ratings
+
+def _newton_steps(H,g):
+    ''' Solve each block H[b] s[b] = g[b].  Singular blocks get nan '''
 
-    # p49 in [1]
     try:
-        for _ in range(iterlimit):
-            nextp = boyd_silk_update(p,tournament.outcomes)
-            if abs(nextp - p).sum() <= tol:
-                p = nextp
-                p = p/p.sum()
+        return np.linalg.solve(H,g[...,None])[...,0]
+    except np.linalg.LinAlgError:
+        steps = np.full(g.shape,np.nan)
+        for b in range(len(g)):
+            try:
+                steps[b] = np.linalg.solve(H[b],g[b])
+            except np.linalg.LinAlgError:
+                pass
+        return steps
+
+def PBS_batch_ranker(tournaments,alpha,start=None,obj_func_args={},
+        gtol=1e-5,maxiter=100):
+    ''' PBS_ranker for many tournaments at once.  A damped Newton
+    method is run on all of them together: the Hessian of the joint
+    problem is block diagonal, one n x n block per tournament.  The
+    kernel functions in *obj_func_args* are used as in PBS_ranker '''
+
+    outcomes = _stack_outcomes(tournaments)
+    nbatch,nplayers = outcomes.shape[:2]
+
+    x = np.zeros((nbatch,nplayers)) if start is None else \
+            np.array(np.broadcast_to(start,(nbatch,nplayers)),dtype=float)
+
+    obj_f,jac_f,hess_f,_ = _kernel_partials(obj_func_args)
+
+    failed = np.zeros(nbatch,bool)
+    todo = np.arange(nbatch)
+
+    with np.errstate(all='ignore'):
+        for _ in range(maxiter):
+            xb,ob = x[todo],outcomes[todo]
+            g = jac_f(xb,ob,alpha)
+
+            # Converged ones drop out
+            keep = abs(g).max(-1) > gtol
+            todo,xb,ob,g = todo[keep],xb[keep],ob[keep],g[keep]
+            if not len(todo):
                 break
-            p = nextp
 
-            # This isn't explicitly written out in [1]
-            p = p/p.sum()
+            step = _newton_steps(hess_f(xb,ob,alpha),g)
+
+            # Fall back to steepest descent where Newton's direction
+            # isn't downhill
+            slope = (g*step).sum(-1)
+            uphill = ~(slope > 0)
+            step[uphill] = g[uphill]
+            slope[uphill] = (g[uphill]**2).sum(-1)
+
+            # Backtrack until there is sufficient decrease
+            f0 = obj_f(xb,ob,alpha)
+            t = np.ones(len(todo))
+            for _ in range(50):
+                xn = xb - t[:,None]*step
+                ok = obj_f(xn,ob,alpha) <= f0 - 1e-4*t*slope
+                if ok.all():
+                    break
+                t[~ok] /= 2
+
+            x[todo] = xn
+            failed[todo[~ok]] = True
+            todo = todo[ok]
         else:
-            raise ConvergenceFailure('Iteration limit exceeded')
-    except RuntimeWarning as e:
-        raise ConvergenceFailure(e)
+            failed[todo] = True
 
+    failed |= ~np.isfinite(x).all(-1)
 
-    # Find Ds as per formula (2) on p48 in [1], but with our
-    # modification that the mean is zero and higher => better
-    res = np.log(p) 
-    return res - res.mean()
+    return _flag_failures(x,failed,'PBS_batch_ranker')
+
+def glicko_batch_ranker(tournaments,*args,**kwargs):
+
+    outcomes = _stack_outcomes(tournaments)
+    r,_ = _glicko_update_masked(np.full(outcomes.shape[:2],1500.),
+            np.full(outcomes.shape[:2],350.),outcomes)
+
+    return r
+
+def boyd_silk_batch_ranker(tournaments,tol = 0.5e-3,
+        iterlimit=10000,start=None,*args,**kwargs):
+    ''' boyd_silk_ranker for many tournaments at once.  Tournaments
+    drop out of the iteration as they converge.  The iteration starts
+    from ratings *start*, if given, instead of from all equal '''
+
+    outcomes = _stack_outcomes(tournaments)
+    nbatch,nplayers = outcomes.shape[:2]
+
+    if start is None:
+        p = np.full((nbatch,nplayers),1/nplayers)
+    else:
+        start = np.broadcast_to(start,(nbatch,nplayers))
+        p = np.exp(start - start.max(-1)[:,None])
+        p /= p.sum(-1)[:,None]
+    todo = np.arange(nbatch)
+
+    # boyd_silk_update with the games between each pair and the wins
+    # worked out once.  These shrink as tournaments converge.
+    games = outcomes + outcomes.swapaxes(-1,-2)
+    wins = outcomes.sum(-1)
+
+    with np.errstate(all='ignore'):
+        for _ in range(iterlimit):
+            pb = p[todo]
+            denom = pb[:,:,None] + pb[:,None,:]
+            np.divide(games,denom,out=denom)
+            nextp = wins/denom.sum(-1)
+            done = abs(nextp - pb).sum(-1) <= tol
+            p[todo] = nextp/nextp.sum(-1)[:,None]
+            if done.any():
+                todo,games,wins = todo[~done],games[~done],wins[~done]
+            if not len(todo):
+                break
+
+        res = np.log(p)
+
+    failed = np.zeros(nbatch,bool)
+    failed[todo] = True
+    failed |= ~np.isfinite(res).all(-1)
+
+    res -= res.mean(-1)[:,None]
+
+    return _flag_failures(res,failed,'boyd_silk_batch_ranker')
 
 # [1] "A Method for Assigning Cardinal Dominance Ranks" 
 #     Robert Boyd and Joan B. Silk, Anim. Behav., 1983, 31, 45-58
@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+import rank_fit.abilities as abilities
+
+class TestInteractions(unittest.TestCase):
+    def runTest(self):
+        skills = np.sort(np.random.uniform(-1,1,8))
+        identity = lambda x: x
+        for style in ['ant','syn']:
+            with self.subTest(style=style):
+                # Balanced table of the wedges themselves
+                ptable = abilities.interactions(skills,style,a=0.5,
+                        cdf=identity,rng=0)
+                for i,j in np.ndindex(ptable.shape):
+                    if i <= j + 1:
+                        continue
+                    up,right = ptable[i-1,j],ptable[i,j+1]
+                    if style == 'ant':
+                        lo,hi = max(up,right),max(up,right) + \
+                                0.5*abs(min(up,right)) + max(up,right)
+                    else:
+                        lo,hi = up + right,up + right + 0.5
+                    self.assertTrue(lo <= ptable[i,j] <= hi)
+
+                self.assertTrue(np.array_equal(ptable,
+                    abilities.interactions(skills,style,a=0.5,
+                        cdf=identity,rng=0)))
+
+class TestStandard(unittest.TestCase):
+    def runTest(self):
+        skills = np.random.uniform(-2,2,50)
+        ptable = abilities.standard(skills)
+        self.assertTrue(np.allclose(ptable + ptable.T,1))
+        self.assertTrue(np.allclose(ptable[np.tril_indices(50,-1)],
+            abilities.standard(skills,packed=True)))
+        for block_bytes in [8,1000]:
+            with self.subTest(block_bytes=block_bytes):
+                self.assertTrue(np.array_equal(ptable,
+                    abilities.standard(skills,block_bytes=block_bytes)))
+                self.assertTrue(np.array_equal(ptable,
+                    abilities.unpack_ptable(abilities.standard(skills,
+                        packed=True,block_bytes=block_bytes),
+                        block_bytes=block_bytes)))
+
+if __name__ == '__main__':
+    unittest.main()
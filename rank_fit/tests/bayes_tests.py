@@ -34,6 +34,8 @@ def testjachess(fun,dfun,ddfun):
     obj_f = lambda x: obj_func(x,outcomes,alpha,func=fun)
     jac_ = lambda x: jac(x,outcomes,alpha,func=fun,dfunc=dfun)
     hess_ = lambda x: hessian(x,outcomes,alpha,func=fun,dfunc=dfun,ddfunc=ddfun)
+    hessp_ = lambda x,p: hessp(x,p,outcomes,alpha,func=fun,dfunc=dfun,
+            ddfunc=ddfun)
 
     for _x in x:
         for _dx in dx:
@@ -43,6 +45,8 @@ def testjachess(fun,dfun,ddfun):
                 warning(fun,_x,_dx)
             if sum(do2**2)**0.5 >= 0.1667*sum(_dx**2)**0.5:
                 warning(dfun,_x,_dx)
+            if not np.allclose(hessp_(_x,_dx),np.dot(hess_(_x),_dx)):
+                warning(ddfun,_x,_dx)
 
 testfun(recipsigmoid,drecipsigmoid,ddrecipsigmoid)
 testfun(arctan,darctan,ddarctan)
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import rank_fit.rankers as rankers
+import rank_fit.tournaments as Tours
+from rank_fit.bootstrap import bootstrap,resample_outcomes
+
+class TestResample(unittest.TestCase):
+    def runTest(self):
+        tour = Tours.SkillsTournament(np.linspace(-2,2,12),2000)
+        outcomes = tour.outcomes.toarray()
+        stack = resample_outcomes(tour.outcomes,50,rng=0)
+        self.assertEqual(stack.shape,(50,12,12))
+        self.assertTrue((stack.sum((1,2)) == outcomes.sum()).all())
+        # Only games which were played are drawn
+        self.assertFalse(stack[:,outcomes == 0].any())
+
+class TestBootstrap(unittest.TestCase):
+    def runTest(self):
+        tour = Tours.SkillsTournament(np.linspace(-2,2,12),2000)
+        for ranker,args in [ (rankers.PBS_ranker,(0.1,)),
+                (rankers.boyd_silk_ranker,()) ]:
+            with self.subTest(ranker=ranker.__name__):
+                res = bootstrap(tour,ranker,*args,nboot=60,seed=0,
+                        batch=25,processes=1)
+                self.assertEqual(res.replicates.shape,(60,12))
+                self.assertTrue(np.isfinite(res.replicates).all())
+                self.assertTrue((res.lower <= res.ratings).all())
+                self.assertTrue((res.ratings <= res.upper).all())
+                self.assertTrue(np.allclose(res.rank_probs.sum(0),1))
+                self.assertTrue(np.allclose(res.rank_probs.sum(1),1))
+                top = np.bincount(res.replicates.argmax(-1),
+                        minlength=12)/60
+                self.assertTrue(np.allclose(res.rank_probs[:,0],top))
+
+        # Same replicates whatever the pool
+        again = bootstrap(tour,rankers.boyd_silk_ranker,nboot=60,
+                seed=0,batch=25,processes=2)
+        self.assertTrue(np.array_equal(again.replicates,res.replicates))
+
+class TestWarmStart(unittest.TestCase):
+    def runTest(self):
+        tour = Tours.SkillsTournament(np.linspace(-2,2,12),2000)
+        stack = resample_outcomes(tour.outcomes,5,rng=1)
+        start = rankers.boyd_silk_ranker(tour)
+        self.assertTrue(np.allclose(
+            rankers.boyd_silk_batch_ranker(stack,tol=1e-8),
+            rankers.boyd_silk_batch_ranker(stack,tol=1e-8,start=start),
+            atol=1e-5))
+
+if __name__ == '__main__':
+    unittest.main()
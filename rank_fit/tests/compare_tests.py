@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from rank_fit.compare_methods import grid_jobs,run_job,sweep,load_results
+
+class TestSweep(unittest.TestCase):
+    def runTest(self):
+        jobs = grid_jobs([[0,1,2,3],[0,.5,1,1.5]],ptables=('standard',),
+                tourtypes=('RandomTournament',),ngames=(100,),
+                ranker_names=('PBS_ranker','elo_ranker'),
+                alphas=(0.1,1.),seed=3)
+        self.assertEqual(len(jobs),6)
+        # The rankers of a cell share its seed
+        self.assertEqual(len({ j['seed'] for j in jobs }),2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp,'sweep.csv')
+            self.assertEqual(sweep(jobs,path,max_workers=1),0)
+            res = load_results(path)
+
+        self.assertEqual(list(res['job']),list(range(6)))
+        self.assertTrue(res['converged'].all())
+        self.assertTrue(np.isfinite(res['spearman']).all())
+        self.assertTrue(np.array_equal(res['alpha'][:3],[.1,1.,np.nan],
+            equal_nan=True))
+
+        # Jobs are reproducible from their seeds
+        for job,ratings in zip(jobs,res['ratings']):
+            self.assertTrue(np.allclose(run_job(job)['ratings'],ratings))
+
+        # Bugs are not taken for convergence failures
+        with self.assertRaises(TypeError):
+            run_job(dict(jobs[0],alpha='0.1'))
+
+if __name__ == '__main__':
+    unittest.main()
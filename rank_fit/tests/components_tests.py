@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from scipy.linalg import block_diag
+import rank_fit.rankers as rankers
+import rank_fit.tournaments as Tours
+from rank_fit.components import components,fit_components
+
+class TestComponents(unittest.TestCase):
+    def runTest(self):
+        blocks = [ np.random.randint(1,3,size=(k,k)) for k in (7,5,4) ]
+        for b in blocks:
+            np.fill_diagonal(b,0)
+        # Player 0 of the last group never loses
+        blocks[2][:,0] = 0
+        outcomes = block_diag(*blocks,np.zeros((1,1),int))
+        perm = np.random.permutation(len(outcomes))
+        outcomes = outcomes[np.ix_(perm,perm)]
+
+        comps = components(outcomes)
+        self.assertEqual([ len(c.players) for c in comps ],[7,5,4,1])
+        self.assertEqual([ c.needs_prior for c in comps ],
+                [False,False,True,False])
+        self.assertEqual(sorted(np.concatenate([ c.players 
+            for c in comps ])),list(range(17)))
+
+        tour = Tours.UserDefinedTournament(outcomes,keep_history=True)
+
+        # Separate components make separate PBS problems
+        joint = rankers.PBS_ranker(tour,0.1,method='newton-cg')
+        for processes in [1,2]:
+            with self.subTest(processes=processes):
+                split,_ = fit_components(tour,rankers.PBS_ranker,0.1,
+                        method='newton-cg',processes=processes)
+                self.assertTrue(np.allclose(split,joint,atol=1e-5))
+
+        # Elo only ever touches the two players of a game
+        split,_ = fit_components(tour,rankers.elo_ranker,32,processes=1)
+        self.assertTrue(np.allclose(split,rankers.elo_ranker(tour,32)))
+
+if __name__ == '__main__':
+    unittest.main()
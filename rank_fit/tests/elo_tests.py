@@ -0,0 +1,26 @@
+import unittest
+import numpy as np
+from rank_fit.elo.elo import ab_fun,ab_vec,elo_ratings
+
+class TestAbVec(unittest.TestCase):
+    def runTest(self):
+        x = np.r_[np.random.uniform(-800,800,1000),0,-4,4,736,-736]
+        self.assertTrue(np.array_equal(ab_vec(x),[ab_fun(_x) for _x in x]))
+
+class TestEloRatings(unittest.TestCase):
+    def runTest(self):
+        for nplayers in [1,2,5,50,500]:
+            history = np.random.randint(0,nplayers,size=(500,2))
+            with self.subTest(nplayers=nplayers):
+                # Game by game, as elo_ranker used to do
+                rank = np.zeros(nplayers)
+                for a,b in history:
+                    d = rank[a] - rank[b]
+                    rank[a] += 32*ab_fun(d)
+                    rank[b] -= 32*ab_fun(d)
+
+                self.assertTrue(np.array_equal(rank,
+                    elo_ratings(history[:,0],history[:,1],nplayers,32)))
+
+if __name__ == '__main__':
+    unittest.main()
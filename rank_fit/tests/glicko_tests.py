@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import warnings
+import numpy as np
+from scipy.sparse import csr_matrix
+import rank_fit.rankers as rankers
+import rank_fit.tournaments as Tours
+from rank_fit.glicko import glicko_update,GlickoPeriods,c2
+
+class TestGlickoPeriods(unittest.TestCase):
+    def runTest(self):
+        n = 8
+        history = np.random.randint(0,n,size=(300,2))
+        history = history[history[:,0] != history[:,1]]
+        times = np.sort(np.random.uniform(0,10,len(history)))
+        # Nothing happens in period 4
+        history,times = history[(times < 4) | (times >= 5)], \
+                times[(times < 4) | (times >= 5)]
+
+        # Straightforward version: everybody inflated every period
+        r,rd = np.full(n,1500.),np.full(n,350.)
+        for k in range(10):
+            rd = np.minimum(np.sqrt(rd**2 + c2),350) if k else rd
+            games = history[np.floor(times) == k]
+            outcomes = np.zeros((n,n),int)
+            np.add.at(outcomes,tuple(games.T),1)
+            r,rd = glicko_update(r,rd,outcomes)
+
+        state = GlickoPeriods(n)
+        state.update(*history.T,times)
+        self.assertEqual(state.current,10)
+        new_r,new_rd = state.ratings(state.current - 1)
+        self.assertTrue(np.allclose(new_r,r))
+        self.assertTrue(np.allclose(new_rd,rd))
+
+        # Resume from a checkpoint half way through
+        first = times < 6
+        state = GlickoPeriods(n)
+        state.update(*history[first].T,times[first])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp,'state.npz')
+            state.save(path)
+            state = GlickoPeriods.load(path)
+        with self.assertRaises(ValueError):
+            state.update(*history[:1].T,times[:1])
+        state.update(*history[~first].T,times[~first])
+        self.assertTrue(np.allclose(state.r,r))
+
+        tour = Tours.TournamentFromHistory(history,nplayers=n,
+                keep_history=True)
+        tour.times = times
+        self.assertTrue(np.allclose(rankers.glicko_ranker(tour,period=1),
+            r))
+
+        # Empty periods cost nothing, however many
+        state = GlickoPeriods(n,origin=-1.7e9)
+        state.update(*history.T,times + 1.7e9)
+        self.assertEqual(state.current,int(3.4e9) + 10)
+        self.assertTrue(np.allclose(state.r,r))
+
+class TestInactivePlayers(unittest.TestCase):
+    def runTest(self):
+        # Importing rank_fit leaves the warning filters alone
+        self.assertFalse(any(f[0] == 'error' and f[2] is RuntimeWarning
+            for f in warnings.filters))
+
+        outcomes = np.random.randint(0,3,size=(6,6))
+        outcomes[[0,3],:] = outcomes[:,[0,3]] = 0
+        r,rd = np.random.normal(1500,100,6),np.random.uniform(50,350,6)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            new_r,new_rd = glicko_update(r,rd,outcomes)
+        self.assertTrue(np.array_equal(new_r[[0,3]],r[[0,3]]))
+        self.assertTrue(np.array_equal(new_rd[[0,3]],rd[[0,3]]))
+
+        # Same as rating the active players on their own
+        part = [1,2,4,5]
+        sub_r,sub_rd = glicko_update(r[part],rd[part],
+                outcomes[np.ix_(part,part)])
+        self.assertTrue(np.allclose(new_r[part],sub_r))
+        self.assertTrue(np.allclose(new_rd[part],sub_rd))
+
+class TestFarApart(unittest.TestCase):
+    def runTest(self):
+        outcomes = np.array([[0,1],[1,0]])
+        r,rd = np.array([0.,2e5]),np.array([50.,50.])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            dense = glicko_update(r,rd,outcomes)
+            sparse = glicko_update(r,rd,csr_matrix(outcomes))
+        self.assertTrue(np.allclose(dense[0],sparse[0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import sys
+import subprocess
+import unittest
+import rank_fit
+
+class TestLazyImport(unittest.TestCase):
+    def runTest(self):
+        loaded = subprocess.run([sys.executable,'-c',
+            'import sys, rank_fit; from rank_fit import PBS_ranker; '
+            'print(*sys.modules)'],stdout=subprocess.PIPE,check=True,
+            universal_newlines=True).stdout.split()
+        for module in ['scipy.optimize','scipy.stats']:
+            self.assertNotIn(module,loaded)
+
+        # The lazy names are those the subpackages export
+        import rank_fit.abilities._factory as abilities
+        import rank_fit.rankers as rankers
+        import rank_fit.tournaments._factory as factory
+        import rank_fit.tournaments._loaders as loaders
+        self.assertEqual(rank_fit.__all__,abilities.__all__ +
+                rankers.__all__ + factory.__all__ + loaders.__all__)
+        for name in rank_fit.__all__:
+            self.assertTrue(callable(getattr(rank_fit,name)))
+        with self.assertRaises(AttributeError):
+            rank_fit.no_such_name
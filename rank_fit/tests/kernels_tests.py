@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+from scipy.optimize import check_grad
+from rank_fit.kernels import kernels,get_kernel
+from scipy import sparse
+from rank_fit.bayes import obj_func,jac,hessian,hessp,recipsigmoid, \
+        PBSEvaluator
+from functools import partial
+import warnings
+import rank_fit.maxlik as maxlik
+
+class TestKernels(unittest.TestCase):
+    def runTest(self):
+        d = np.linspace(-6,6,25)
+        h = 1e-5
+        for name,k in kernels.items():
+            with self.subTest(kernel=name):
+                self.assertIs(get_kernel(name),k)
+                self.assertTrue(np.allclose(np.exp(k.logk(d)),k.cdf(d)))
+                self.assertTrue(np.allclose(k.dlogk(d),
+                    (k.logk(d + h) - k.logk(d - h))/(2*h),atol=1e-6))
+                self.assertTrue(np.allclose(k.d2logk(d),
+                    (k.dlogk(d + h) - k.dlogk(d - h))/(2*h),atol=1e-6))
+                for a,b in zip(k.fused(d),(k.logk(d),k.dlogk(d),
+                    k.d2logk(d))):
+                    self.assertTrue(np.allclose(a,b))
+
+                # Finite far out in the tails
+                with np.errstate(all='raise'):
+                    for v in k.fused(np.array([-1e3,1e3])):
+                        self.assertTrue(np.isfinite(v).all())
+
+        with self.assertRaises(ValueError):
+            get_kernel('nonsense')
+
+class TestBayesKernels(unittest.TestCase):
+    def runTest(self):
+        outcomes = np.random.randint(0,4,size=(6,6))
+        x,p = np.random.normal(size=(2,6))
+
+        # The default is the old recipsigmoid objective
+        self.assertTrue(np.isclose(obj_func(x,outcomes,0.1),
+            obj_func(x,outcomes,0.1,func=recipsigmoid)))
+
+        for name in kernels:
+            with self.subTest(kernel=name):
+                f = lambda y: obj_func(y,outcomes,0.1,kernel=name)
+                g = lambda y: jac(y,outcomes,0.1,kernel=name)
+                self.assertLess(check_grad(f,g,x),1e-5)
+                H = hessian(x,outcomes,0.1,kernel=name)
+                self.assertTrue(np.allclose(H,
+                    np.array([ (g(x + 1e-6*e) - g(x - 1e-6*e))/2e-6
+                        for e in np.eye(6) ]),atol=1e-5))
+                self.assertTrue(np.allclose(H @ p,
+                    hessp(x,p,outcomes,0.1,kernel=name)))
+
+class TestPBSEvaluator(unittest.TestCase):
+    def runTest(self):
+        outcomes = np.random.randint(0,4,size=(9,9))
+        x,p = 3*np.random.normal(size=(2,9))
+
+        for name in kernels:
+            for out in [outcomes,sparse.csr_matrix(outcomes)]:
+                for dtype in [np.float64,np.float32]:
+                    with self.subTest(kernel=name,sparse=out is not
+                            outcomes,dtype=dtype):
+                        # Several blocks of rows
+                        ev = PBSEvaluator(out,0.1,name,dtype,block=20)
+                        f,g = ev.fun_and_jac(x)
+                        self.assertTrue(np.isclose(f,
+                            obj_func(x,outcomes,0.1,kernel=name)))
+                        self.assertTrue(np.allclose(g,
+                            jac(x,outcomes,0.1,kernel=name)))
+
+                        H = hessian(x,outcomes,0.1,kernel=name)
+                        hess = ev.hess(x)
+                        if sparse.issparse(hess):
+                            hess = hess.toarray()
+                        self.assertTrue(np.allclose(hess,H,atol=1e-6))
+                        self.assertTrue(np.allclose(ev.hessp(x,p),H @ p,
+                            atol=1e-5))
+
+class TestMaxlik(unittest.TestCase):
+    def runTest(self):
+        data = np.random.randint(1,6,size=(6,6))
+        np.fill_diagonal(data,0)
+
+        # Another objective gets no probit derivatives
+        x = maxlik.optimize(data,partial(maxlik.objfunc,
+            logkernel='logistic'),method='BFGS')
+        self.assertTrue(np.allclose(maxlik.jac(x[1:],data,
+            logkernel='logistic'),0,atol=1e-3))
+
+        # No Hessian for methods which don't take one
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            y = maxlik.optimize(data,method='BFGS')
+        self.assertTrue(np.allclose(y,maxlik.optimize(data),atol=1e-4))
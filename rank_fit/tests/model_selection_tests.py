@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+import rank_fit.tournaments as Tours
+from rank_fit.model_selection import game_folds,_held_out,\
+        cross_validate_alpha,cross_validate_k
+
+class TestFolds(unittest.TestCase):
+    def runTest(self):
+        skills = np.random.normal(size=30)
+        tour = Tours.SkillsTournament(skills,1500,keep_history=True)
+        history = tour.history
+        for by in ['random','time']:
+            with self.subTest(by=by):
+                folds = game_folds(tour,4,by,seed=1)
+                self.assertEqual(sorted(np.concatenate(folds)),
+                        list(range(len(history))))
+
+                # Training outcomes and held out games make up the
+                # whole tournament
+                test = history[folds[0]]
+                train = _held_out(tour.outcomes,test)
+                held = Tours.TournamentFromHistory(test,sparse=True,
+                        nplayers=tour.nplayers).outcomes
+                self.assertTrue(((train + held) != 
+                    tour.outcomes).nnz == 0)
+
+        # Time folds are consecutive games
+        tour.times = np.arange(len(history))[::-1]
+        self.assertEqual(list(game_folds(tour,3,'time')[0]),
+                list(range(len(history)-1,len(history)-501,-1)))
+
+        # Without a history, games come from the outcomes, in no
+        # particular order
+        tour = Tours.SkillsTournament(skills,1500)
+        self.assertEqual(sum(map(len,game_folds(tour,4,seed=1))),1500)
+        with self.assertRaises(ValueError):
+            game_folds(tour,4,'time')
+
+class TestSearch(unittest.TestCase):
+    def runTest(self):
+        skills = np.random.normal(size=30)
+        tour = Tours.SkillsTournament(skills,1500,keep_history=True)
+        alphas = [ 0.001, 10., 0.1 ]
+        for processes in [1,2]:
+            with self.subTest(processes=processes):
+                res = cross_validate_alpha(tour,alphas,nfolds=3,
+                        seed=0,method='newton-cg',processes=processes)
+                self.assertEqual(list(res.params),[10.,0.1,0.001])
+                self.assertEqual(res.fold_loss.shape,(3,3))
+                self.assertTrue(np.isfinite(res.loss).all())
+                self.assertIn(res.best,alphas)
+                # Ratings squashed to zero predict nothing
+                self.assertLess(res.loss.min(),np.log(2))
+
+        res = cross_validate_k(tour,[1,16,64],nfolds=3,by='time',
+                processes=1)
+        self.assertTrue(np.isfinite(res.loss).all())
+        self.assertIn(res.best,[1,16,64])
+
+if __name__ == '__main__':
+    unittest.main()
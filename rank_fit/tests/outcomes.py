@@ -3,6 +3,7 @@ import unittest
 import numpy as np
 import rank_fit.rankers as rankers
 import rank_fit.tournaments as Tours
+from rank_fit.incremental import IncrementalPBS
 
 class TestOutcomes(unittest.TestCase):
     def runTest(self):
@@ -31,5 +32,104 @@ class TestOutcomeswElo(unittest.TestCase):
                             pass
                     rankers.elo_ranker(tour,k=32)
 
+class TestPBSMethods(unittest.TestCase):
+    def runTest(self):
+        # Seeded, as Newton-CG occasionally gives up on precision loss
+        # right at the optimum
+        candidates = np.random.default_rng(0).integers(0,5,size=(20,5,5))
+        for c in candidates:
+            tour = Tours.UserDefinedTournament(c)
+            expected = rankers.PBS_ranker(tour,alpha=0.01)
+            for method in ['newton-cg','trust-ncg','trust-krylov',
+                    'trust-exact']:
+                with self.subTest(c=c,method=method):
+                    x = rankers.PBS_ranker(tour,alpha=0.01,method=method)
+                    # BFGS stops at a looser tolerance
+                    self.assertTrue(np.allclose(expected,x,atol=1e-3))
+
+class TestPBSPath(unittest.TestCase):
+    def runTest(self):
+        # Seeded, as BFGS at times loses precision before the kernel
+        # below fails
+        c = np.random.default_rng(0).integers(0,5,size=(6,6))
+        tour = Tours.UserDefinedTournament(c)
+        path = rankers.PBS_path(tour,[0.01,1,10,0.1],method='trust-exact')
+        self.assertTrue(np.array_equal(path.alphas,[10,1,0.1,0.01]))
+        self.assertIsNone(path.failure)
+        for alpha,x in zip(path.alphas,path.ratings):
+            self.assertTrue(np.allclose(x,rankers.PBS_ranker(tour,alpha,
+                method='trust-exact'),atol=1e-4))
+
+        # A kernel which fails once ratings are far enough apart
+        def func(d):
+            if (abs(d) > 5).any():
+                raise FloatingPointError('Too far apart')
+            return 1 + np.exp(-d)
+
+        c[:,0] = 0
+        path = rankers.PBS_path(Tours.UserDefinedTournament(c),
+                [1e3,0],obj_func_args={'func':func,
+                    'dfunc':lambda d: -np.exp(-d)})
+        self.assertEqual(len(path.ratings),1)
+        self.assertIsNotNone(path.failure)
+
+class TestBoydSilk(unittest.TestCase):
+    def runTest(self):
+        candidates = np.random.randint(1,5,size=(20,5,5))
+        for c in candidates:
+            tour = Tours.UserDefinedTournament(c)
+            with self.subTest(c=c):
+                plain = rankers.boyd_silk_ranker(tour,tol=1e-9,
+                        accelerate=False)
+                fast = rankers.boyd_silk_ranker(tour,tol=1e-9)
+                self.assertTrue(np.allclose(plain,fast,atol=1e-6))
+
+        c[0] = 0
+        with self.assertRaises(rankers.ConvergenceFailure):
+            rankers.boyd_silk_ranker(Tours.UserDefinedTournament(c))
+
+class TestBatchOutcomes(unittest.TestCase):
+    def runTest(self):
+        candidates = np.random.randint(1,5,size=(20,5,5))
+        tours = [ Tours.UserDefinedTournament(c) for c in candidates ]
+        for batch,single,kw in [
+                (rankers.PBS_batch_ranker,rankers.PBS_ranker,
+                    {'alpha':0.01}),
+                (rankers.glicko_batch_ranker,rankers.glicko_ranker,{}),
+                (rankers.boyd_silk_batch_ranker,rankers.boyd_silk_ranker,
+                    {'tol':1e-8})]:
+            with self.subTest(ranker=single):
+                expected = [ single(t,**kw) for t in tours ]
+                self.assertTrue(np.allclose(batch(candidates,**kw),
+                    expected,atol=1e-4))
+                self.assertTrue(np.allclose(batch(tours,**kw),
+                    expected,atol=1e-4))
+
+class TestIncremental(unittest.TestCase):
+    def runTest(self):
+        history = np.random.randint(0,8,size=(300,2))
+        for sparse in [False,True]:
+            with self.subTest(sparse=sparse):
+                inc = IncrementalPBS(0.01,sparse=sparse)
+                inc.update(*history[:200].T,nplayers=6)
+                # Brings in two new players
+                inc.update(*history[200:].T,nplayers=8)
+                tour = Tours.TournamentFromHistory(history,nplayers=8)
+                self.assertTrue(np.allclose(inc.ratings,
+                    rankers.PBS_ranker(tour,alpha=0.01),atol=1e-4))
+
+        # Starting from a tournament, which is left alone
+        for tsparse in [False,True]:
+            for sparse in [False,True]:
+                with self.subTest(tsparse=tsparse,sparse=sparse):
+                    start = Tours.TournamentFromHistory(history[:200],
+                            nplayers=8,sparse=tsparse)
+                    before = start.outcomes.copy()
+                    inc = IncrementalPBS(0.01,start,sparse=sparse)
+                    inc.update(*history[200:].T)
+                    self.assertTrue((start.outcomes != before).sum() == 0)
+                    self.assertTrue(np.allclose(inc.ratings,
+                        rankers.PBS_ranker(tour,alpha=0.01),atol=1e-4))
+
 if __name__ == '__main__':
     unittest.main()
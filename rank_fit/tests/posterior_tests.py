@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+import rank_fit.tournaments as Tours
+from rank_fit.bayes import hessian
+from rank_fit.posterior import laplace_posterior
+
+class TestLaplaceExact(unittest.TestCase):
+    def runTest(self):
+        tour = Tours.SkillsTournament(np.random.normal(size=40),1500)
+        dense = Tours.UserDefinedTournament(tour.outcomes.toarray())
+        for kernel in ['logistic','probit']:
+            with self.subTest(kernel=kernel):
+                args = {'kernel':kernel}
+                post = laplace_posterior(dense,0.1,obj_func_args=args,
+                        method='newton-cg')
+                cov = np.linalg.inv(hessian(post.ratings,dense.outcomes,
+                    0.1,**args))
+                self.assertTrue(np.allclose(post.variances,cov.diagonal()))
+
+                # Sparse outcomes, same Hessian
+                again = laplace_posterior(tour,0.1,post.ratings,
+                        obj_func_args=args)
+                self.assertTrue(np.allclose(again.variances,
+                    post.variances))
+
+class TestLaplaceProbes(unittest.TestCase):
+    def runTest(self):
+        tour = Tours.SkillsTournament(np.random.normal(size=40),1500)
+        exact = laplace_posterior(tour,0.1,method='newton-cg')
+        est = laplace_posterior(tour,0.1,exact.ratings,
+                solver='probes',nprobes=400,seed=0)
+        self.assertTrue(np.allclose(est.stderr,exact.stderr,rtol=0.1))
+
+class TestLaplaceFailures(unittest.TestCase):
+    def runTest(self):
+        tour = Tours.SkillsTournament(np.random.normal(size=40),1500)
+        with self.assertRaises(ValueError):
+            laplace_posterior(tour,0.,np.zeros(40))
+
+        # The arctan kernel's curvature changes sign far out
+        bad = np.linspace(-50,50,40)[np.argsort(tour.skills)[::-1]]
+        for solver in ['cholesky','probes']:
+            with self.subTest(solver=solver):
+                with self.assertRaises(ValueError):
+                    laplace_posterior(tour,0.1,bad,solver=solver,
+                            obj_func_args={'kernel':'arctan'})
+
+        with self.assertWarns(UserWarning):
+            laplace_posterior(tour,0.1,np.zeros(40),solver='probes',
+                    maxiter=2)
+
+if __name__ == '__main__':
+    unittest.main()
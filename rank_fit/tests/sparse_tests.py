@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from scipy import sparse
+import rank_fit.rankers as rankers
+import rank_fit.tournaments as Tours
+from rank_fit.bayes import obj_func,jac,hessian,hessp
+from rank_fit.glicko import glicko_update
+
+class TestSparseDerivatives(unittest.TestCase):
+    def runTest(self):
+        candidates = np.random.randint(0,3,size=(20,6,6))
+        for c in candidates:
+            with self.subTest(c=c):
+                s = sparse.csr_matrix(c)
+                x,p = np.random.normal(size=(2,6))
+                self.assertTrue(np.isclose(obj_func(x,c,0.1),
+                    obj_func(x,s,0.1)))
+                self.assertTrue(np.allclose(jac(x,c,0.1),jac(x,s,0.1)))
+                self.assertTrue(np.allclose(hessian(x,c,0.1),
+                    hessian(x,s,0.1).toarray()))
+                self.assertTrue(np.allclose(hessp(x,p,c,0.1),
+                    hessp(x,p,s,0.1)))
+
+class TestSparseGlicko(unittest.TestCase):
+    def runTest(self):
+        candidates = np.random.randint(0,3,size=(20,6,6))
+        for c in candidates:
+            # Leave a player out of the tournament
+            c[0,:] = c[:,0] = 0
+            with self.subTest(c=c):
+                r = np.random.normal(1500,100,6)
+                rd = np.random.uniform(50,350,6)
+                dense = glicko_update(r,rd,c)
+                sp = glicko_update(r,rd,sparse.csr_matrix(c))
+                self.assertTrue(np.allclose(dense,sp))
+
+class TestSparseRankers(unittest.TestCase):
+    def runTest(self):
+        candidates = np.random.randint(1,5,size=(20,5,5))
+        for c in candidates:
+            np.fill_diagonal(c,0)
+            tour = Tours.UserDefinedTournament(c)
+            sptour = Tours.UserDefinedTournament(sparse.coo_matrix(c))
+            for ranker,kw in [(rankers.PBS_ranker,{'alpha':0.01}),
+                    (rankers.glicko_ranker,{}),
+                    (rankers.boyd_silk_ranker,{})]:
+                with self.subTest(c=c,ranker=ranker):
+                    self.assertTrue(np.allclose(ranker(tour,**kw),
+                        ranker(sptour,**kw),atol=1e-4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import numpy as np
+import rank_fit.tournaments as Tours
+import rank_fit.abilities as abilities
+
+class TestTournamentFromHistory(unittest.TestCase):
+    def runTest(self):
+        history = np.random.randint(0,7,size=(200,2))
+        outcomes = np.zeros((7,7),int)
+        for a,b in history:
+            outcomes[a,b] += 1
+
+        tour = Tours.TournamentFromHistory(history.tolist(),
+                keep_history=True)
+        self.assertTrue(np.array_equal(tour.outcomes,outcomes))
+        self.assertTrue(np.array_equal(tour.history,history))
+
+        tour = Tours.TournamentFromHistory.from_columns(*history.T,
+                nplayers=9,sparse=True)
+        self.assertEqual(tour.nplayers,9)
+        self.assertTrue(np.array_equal(tour.outcomes.toarray()[:7,:7],
+            outcomes))
+
+class TestHistory(unittest.TestCase):
+    def runTest(self):
+        ptable = abilities.standard(np.random.uniform(-2,2,6))
+        for tour in [Tours.RandomTournament(ptable,100,keep_history=True),
+                Tours.EvenlyDistributedTournament(ptable,100,
+                    keep_history=True),
+                Tours.UserDefinedTournament(
+                    np.random.randint(0,5,size=(6,6)),keep_history=True)]:
+            with self.subTest(tour=tour):
+                outcomes = np.zeros(tour.outcomes.shape,int)
+                np.add.at(outcomes,tuple(tour.history.T),1)
+                self.assertTrue(np.array_equal(outcomes,tour.outcomes))
+
+        tour = Tours.RandomTournament(ptable,100)
+        self.assertFalse(hasattr(tour,'history'))
+
+class TestSkillsTournament(unittest.TestCase):
+    def runTest(self):
+        skills = np.array([0.,1.,-1.])
+        tour = Tours.SkillsTournament(skills,30000,keep_history=True,
+                chunksize=7000)
+        outcomes = tour.outcomes.toarray()
+        self.assertEqual(outcomes.sum(),30000)
+        self.assertEqual(len(tour.history),30000)
+        self.assertTrue((np.diag(outcomes) == 0).all())
+
+        # Same expected outcomes as a RandomTournament
+        expected = 2*abilities.standard(skills)*30000/6
+        np.fill_diagonal(expected,0)
+        self.assertTrue(np.allclose(outcomes,expected,rtol=0.1))
+
+class TestLogLoaders(unittest.TestCase):
+    def runTest(self):
+        import os
+        import tempfile
+
+        history = np.random.randint(0,8,size=(500,2))
+        times = np.arange(500.)
+        names = ['p{}'.format(k) for k in range(8)]
+        expected = Tours.TournamentFromHistory(history,nplayers=8)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp,'log.csv')
+            with open(path,'w') as f:
+                f.write('when,won,lost\n')
+                for (a,b),t in zip(history,times):
+                    f.write('{},{},{}\n'.format(t,names[a],names[b]))
+
+            index = Tours.PlayerIndex()
+            tour = Tours.tournament_from_log(Tours.read_csv_log(path,
+                'won','lost','when',header=True,index=index,chunksize=64),
+                keep_history=True)
+            order = np.argsort(index.ids)
+            self.assertTrue(np.array_equal(
+                tour.outcomes.toarray()[np.ix_(order,order)],
+                expected.outcomes))
+            self.assertTrue(np.array_equal(index.decode(tour.history),
+                np.array(names)[history].ravel()))
+            self.assertTrue(np.array_equal(tour.times,times))
+
+            index.save(os.path.join(tmp,'ids.json'))
+            loaded = Tours.PlayerIndex.load(os.path.join(tmp,'ids.json'))
+            self.assertEqual(loaded.ids,index.ids)
+            with self.assertRaises(KeyError):
+                loaded.encode(['nobody'],grow=False)
+
+            np.save(os.path.join(tmp,'log.npy'),history)
+            history.astype(np.int32).tofile(os.path.join(tmp,'log.bin'))
+            for name in ['log.npy','log.bin']:
+                with self.subTest(name=name):
+                    tour = Tours.tournament_from_log(Tours.read_pairs_log(
+                        os.path.join(tmp,name),chunksize=100),
+                        nplayers=8,sparse=False)
+                    self.assertTrue(np.array_equal(tour.outcomes,
+                        expected.outcomes))
+
+        # Numbered in order of first appearance, winner before loser
+        index = Tours.PlayerIndex()
+        self.assertEqual(index.encode([['b','a'],['c','b'],['a','d']]
+            ).tolist(),[[0,1],[2,0],[1,3]])
+        self.assertEqual(index.ids,['b','a','c','d'])
+
+if __name__ == '__main__':
+    unittest.main()
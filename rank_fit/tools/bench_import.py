@@ -0,0 +1,67 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+''' Time taken by `import rank_fit' and its heavier parts, each in a
+fresh interpreter, and which scipy subpackages they pull in.
+
+Usage: python -m rank_fit.tools.bench_import [repeats] '''
+
+import sys
+import subprocess
+
+__all__ = ['import_time','bench']
+
+statements = [ 'import rank_fit', 'import rank_fit.tournaments',
+        'import rank_fit.rankers', 'from rank_fit import PBS_ranker' ]
+
+heavy = [ 'scipy.optimize', 'scipy.stats', 'scipy.special',
+        'scipy.sparse' ]
+
+_script = '''
+import sys, time
+t = time.perf_counter()
+{}
+t = time.perf_counter() - t
+print(t, *[ m for m in {!r} if m in sys.modules ])
+'''
+
+def import_time(statement,repeats=5):
+    ''' Best wall time over *repeats* fresh interpreters, and the
+    modules of `heavy' which were loaded '''
+
+    best = None
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable,'-c',
+            _script.format(statement,heavy)],stdout=subprocess.PIPE,
+            check=True,universal_newlines=True).stdout.split()
+        t = float(out[0])
+        best = t if best is None else min(best,t)
+
+    return best,out[1:]
+
+def bench(repeats=5,out=sys.stdout):
+    ''' Print one line per statement '''
+
+    for statement in statements:
+        t,loaded = import_time(statement,repeats)
+        print('{:<35} {:>8.3f}s  {}'.format(statement,t,
+            ' '.join(loaded)),file=out)
+        out.flush()
+
+if __name__ == '__main__':
+    bench(*[ int(a) for a in sys.argv[1:] ])
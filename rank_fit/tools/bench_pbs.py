@@ -0,0 +1,90 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+''' Iteration counts and wall time of the scipy methods available to
+PBS_ranker, on random tournaments of increasing size.
+
+Usage: python -m rank_fit.tools.bench_pbs [--sparse] [n ...]
+
+BFGS keeps a dense n x n inverse Hessian, so expect it to take minutes
+at n = 5000. '''
+
+import sys
+import time
+import numpy as np
+from rank_fit.tournaments import TournamentFromHistory
+from rank_fit.rankers import _PBS_minimize,_method_kw,ConvergenceFailure
+
+__all__ = ['bench']
+
+methods = [ None, 'newton-cg', 'trust-ncg', 'trust-krylov', 'trust-exact' ]
+
+def random_tournament(n,games_per_player=20,sparse=False):
+    ''' Players with standard normal skills play random opponents and
+    win with logistic probability '''
+
+    skills = np.random.normal(size=n)
+    ngames = games_per_player*n
+    a = np.random.randint(0,n,ngames)
+    b = (a + np.random.randint(1,n,ngames)) % n
+    win = np.random.random(ngames) < 1/(1+np.exp(skills[b] - skills[a]))
+
+    return TournamentFromHistory.from_columns(np.where(win,a,b),
+            np.where(win,b,a),nplayers=n,sparse=sparse)
+
+def bench(sizes=(10,100,1000,5000),alpha=0.01,sparse=False,
+        methods=methods,out=sys.stdout):
+    ''' Print one line per size and method '''
+
+    print('{:>6} {:>13} {:>6} {:>6} {:>10} {:>10}'.format('n','method',
+        'nit','nfev','seconds','max|dx|'),file=out)
+
+    for n in sizes:
+        np.random.seed(n)
+        tour = random_tournament(n,sparse=sparse)
+        start = np.zeros(n)
+        ref = None
+
+        for method in methods:
+            if sparse and method == 'trust-exact':
+                continue
+
+            t = time.perf_counter()
+            try:
+                res = _PBS_minimize(tour.outcomes,alpha,start,
+                        **_method_kw(method,tour.outcomes))
+            except ConvergenceFailure as e:
+                print('{:>6} {:>13} failed: {}'.format(n,
+                    method or 'BFGS',e),file=out)
+                continue
+            t = time.perf_counter() - t
+
+            if ref is None:
+                ref = res.x
+
+            print('{:>6} {:>13} {:>6} {:>6} {:>10.3f} {:>10.2e}'.format(n,
+                method or 'BFGS',res.nit,res.nfev,t,
+                abs(res.x - ref).max()),file=out)
+            out.flush()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    sparse = '--sparse' in args
+    sizes = [ int(a) for a in args if a != '--sparse' ] or \
+            (10,100,1000,5000)
+    bench(sizes,sparse=sparse)
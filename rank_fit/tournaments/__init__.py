@@ -16,3 +16,4 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from rank_fit.tournaments._factory import *
+from rank_fit.tournaments._loaders import *
@@ -20,32 +20,66 @@
 __all__ = [ 'Tournament', 'RandomTournament',
         'EvenlyDistributedTournament', 
         'UserDefinedTournament',
-        'TournamentFromHistory']
+        'TournamentFromHistory', 'SkillsTournament']
 
 import numpy as np
 # TODO Access this through package instead?
-from rank_fit.abilities._factory import validate_ptable
+from rank_fit.abilities._factory import validate_ptable,_default_cdf
+from rank_fit.contests import issparse,edges
+from scipy.sparse import coo_matrix
 
 class Tournament:
     ''' Base class for tournaments '''
 
-    def __init__(self,ptable,ngames,keep_history = False):
-        validate_ptable(ptable)
+    def __init__(self,ptable,ngames,keep_history = False,nplayers = None):
+
+        # No ptable is available for sparse user provided outcomes, so
+        # the number of players must be given instead
+        if ptable is not None:
+            validate_ptable(ptable)
+            nplayers = ptable.shape[0]
+
         self.ptable = ptable
-        self.nplayers = ptable.shape[0]
+        self.nplayers = nplayers
         self.ngames = ngames
         # We don't make an outcomes attribute here
 
         # TODO Cleaner way of reporting when user tries to use this
         # base class
 
-        # Elo_ranking needs entire history of tournament
-        if keep_history:
-            self.history = []
+        # Elo_ranking needs entire history of tournament.  Unless one
+        # is given, it is made from the outcomes when first asked for.
+        self.keep_history = keep_history
+        self._history = None
+
+    @property
+    def history(self):
+        ''' (H,2) array of (winner, loser) rows '''
+
+        if not self.keep_history:
+            raise AttributeError('Tournament made without keep_history')
+
+        if self._history is None:
+            self._history = _shuffled_history(self.outcomes)
+
+        return self._history
+
+    @history.setter
+    def history(self,history):
+        self._history = history
 
     def __repr__(self):
         return 'Tournament Outcomes\n'+self.outcomes.__repr__()
 
+def _shuffled_history(outcomes):
+    ''' A history in random order consistent with the outcomes '''
+
+    ind1,ind2,count = edges(outcomes)
+    history = np.repeat(np.column_stack((ind1,ind2)).astype(np.int32),
+            count,axis=0)
+
+    return history[np.random.permutation(len(history))]
+
 class RandomTournament(Tournament):
     ''' Select random pairs for contests and record results in an
     outcome matrix '''
@@ -69,15 +103,53 @@ class RandomTournament(Tournament):
         self.outcomes = \
                 np.random.multinomial(self.ngames,probs.flat).reshape(dim,dim)
 
-        # Now create history if needed
+class SkillsTournament(Tournament):
+    ''' A RandomTournament with ptable abilities.standard(skills,cdf),
+    simulated without making the ptable.  Each game is between a
+    uniformly chosen pair of players, and the first wins with
+    probability cdf(skill difference).  Games are simulated
+    *chunksize* at a time and outcomes are a scipy.sparse matrix, so
+    memory is proportional to the number of games rather than to the
+    square of the number of players '''
+
+    def __init__(self,skills,ngames,cdf=None,keep_history=False,
+            chunksize=2**20):
+
+        skills = np.asarray(skills,dtype=float)
+        n = len(skills)
+        assert n >= 2
+
+        super().__init__(None,ngames,keep_history,nplayers=n)
+        self.skills = skills
 
-        if hasattr(self,'history'):
-            assert self.history == []
+        if cdf is None:
+            cdf = _default_cdf
 
-            for ind1,ind2 in np.ndindex(*(dim,)*2):
-                self.history.extend(self.outcomes[ind1,ind2]*[[ind1,ind2]])
+        outcomes = coo_matrix((n,n),dtype=int).tocsr()
+        history = []
 
-            np.random.shuffle(self.history)
+        for start in range(0,ngames,chunksize):
+            m = min(chunksize,ngames - start)
+
+            # Ordered pairs of distinct players
+            a = np.random.randint(0,n,m)
+            b = np.random.randint(0,n-1,m)
+            b += b >= a
+
+            win = np.random.random_sample(m) < cdf(skills[a] - skills[b])
+            winners,losers = np.where(win,a,b),np.where(win,b,a)
+
+            outcomes += coo_matrix((np.ones(m,dtype=int),(winners,losers)),
+                    shape=(n,n)).tocsr()
+            if keep_history:
+                history.append(np.column_stack((winners,losers)).astype(
+                    np.int32))
+
+        self.outcomes = outcomes
+
+        if keep_history:
+            self.history = np.concatenate(history) if history else \
+                    np.empty((0,2),np.int32)
 
 class EvenlyDistributedTournament(Tournament):
     ''' Number of games is as much as possible evenly distributed
@@ -99,9 +171,6 @@ class EvenlyDistributedTournament(Tournament):
                 np.random.multinomial(rest,
                         np.full(npairs,1/npairs))
 
-        if hasattr(self,'history'):
-            assert not self.history
-
         self.outcomes = np.empty((n,n),int)
 
         I = np.indices(self.outcomes.shape)
@@ -116,74 +185,78 @@ class EvenlyDistributedTournament(Tournament):
         self.outcomes[utri] = tr.T[utri]
         self.outcomes[np.diag_indices(n)] = 0
 
-        # Create history if needed
-
-        if hasattr(self,'history'):
-            assert self.history == []
-
-            for ind1,ind2 in np.ndindex(self.outcomes.shape):
-                self.history.extend(
-                        self.outcomes[ind1,ind2]*[[ind1,ind2]])
-
-            np.random.shuffle(self.history)
-
 class UserDefinedTournament(Tournament):
-    ''' The user provides her own outcomes matrix '''
+    ''' The user provides her own outcomes matrix, either as an array
+    or as a scipy.sparse matrix '''
 
     def __init__(self,outcomes,**kwargs):
 
-        # TODO Fix this nonsense later
-        
-        # Dummy arguments
-        args = [ np.full(outcomes.shape,np.nan),
-                #ngames
-                outcomes.sum() ]
+        if issparse(outcomes):
+            # A dummy ptable would cost O(n^2) memory
+            outcomes = outcomes.tocsr()
+            super().__init__(None,outcomes.sum(),
+                    nplayers=outcomes.shape[0],**kwargs)
+        else:
+            # TODO Fix this nonsense later
 
-        super().__init__(*args,**kwargs)
+            # Dummy arguments
+            args = [ np.full(outcomes.shape,np.nan),
+                    #ngames
+                    outcomes.sum() ]
 
-        self.outcomes = outcomes
+            super().__init__(*args,**kwargs)
 
-        #Let's allow a history so it works with Elo
+        # A fake history is made from these if asked for, so that it
+        # works with Elo
+        self.outcomes = outcomes
 
-        if hasattr(self,'history'):
-            #Make a fake history
-            assert self.history == []
+class TournamentFromHistory(Tournament):
+    ''' Make tournament from user provided history: an (H,2) array-like
+    whose rows are (winner, loser).  Players are numbered from zero, and
+    there are *nplayers* of them, or as many as the history implies.  If
+    *sparse* is set the outcomes are a scipy.sparse matrix '''
 
-            for ind1,ind2 in np.ndindex(self.outcomes.shape):
-                self.history.extend(
-                        self.outcomes[ind1,ind2]*[[ind1,ind2]])
+    def __init__(self,history,nplayers=None,sparse=False,**kwargs):
 
-            np.random.shuffle(self.history)
+        history = np.asarray(history).reshape(-1,2)
+        assert history.size == 0 or \
+                np.issubdtype(history.dtype,np.integer)
+        assert history.size == 0 or history.min() >= 0
 
-class TournamentFromHistory(Tournament):
-    ''' Make tournament from user provided history '''
+        dim = history.max() + 1 if history.size else 0
+        if nplayers is not None:
+            assert nplayers >= dim
+            dim = nplayers
 
-    def __init__(self,history,**kwargs):
-        assert isinstance(history,(list,tuple))
-        dim = 0
-        for p in history:
-            assert len(p) == 2
-            dim = max(dim,*p)
-        dim += 1
+        # Compact storage, one row per game
+        history = history.astype(np.int32 if dim <= 2**31 else np.int64)
+        winners,losers = history.T
 
-        outcomes = np.empty((dim,dim))
+        # One pass over the history
+        if sparse:
+            outcomes = coo_matrix((np.ones(len(history),dtype=int),
+                (winners,losers)),shape=(dim,dim)).tocsr()
+            super().__init__(None,len(history),nplayers=dim,**kwargs)
+        else:
+            outcomes = np.bincount(winners.astype(np.intp)*dim + losers,
+                    minlength=dim*dim).reshape(dim,dim)
 
-        history_t = [ tuple(p) for p in history ]
-        for index in np.ndindex(outcomes.shape):
-            outcomes[index] = history_t.count(tuple(index))
+            # TODO Fix this nonsense later
 
-        # TODO Fix this nonsense later
-        
-        # Dummy arguments
-        args = [ np.full(outcomes.shape,np.nan),
-                #ngames
-                outcomes.sum() ]
+            # Dummy arguments
+            args = [ np.full(outcomes.shape,np.nan),
+                    #ngames
+                    len(history) ]
 
-        super().__init__(*args,**kwargs)
+            super().__init__(*args,**kwargs)
 
         self.outcomes = outcomes
 
-        if hasattr(self,'history'):
-            assert self.history == []
-
+        if self.keep_history:
             self.history = history
+
+    @classmethod
+    def from_columns(cls,winners,losers,**kwargs):
+        ''' Make tournament from separate winner and loser columns '''
+
+        return cls(np.column_stack((winners,losers)),**kwargs)
@@ -0,0 +1,221 @@
+# An algorithm for assigning numerical ranks from a set of pairwise contests
+# Copyright (C) 2018 Devin Greene
+# email: devin@greene.cz
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+''' Reading tournaments from game logs on disk.  Logs are read a chunk
+of games at a time, so a log need never be held in memory as Python
+objects: only the played pairs and their counts are kept, plus the
+history itself if asked for '''
+
+__all__ = [ 'PlayerIndex', 'read_csv_log', 'read_pairs_log',
+        'tournament_from_log' ]
+
+import csv
+import json
+from itertools import islice
+import numpy as np
+from rank_fit.tournaments._factory import UserDefinedTournament
+from scipy.sparse import coo_matrix
+
+CHUNKSIZE = 2**20
+
+class PlayerIndex:
+    ''' Maps player IDs, strings or ints, to players 0, 1, 2, ... in
+    the order first seen.  Saved to and loaded from JSON, so that the
+    same numbering can be used for later logs '''
+
+    def __init__(self,ids=()):
+        self.ids = []
+        self._codes = {}
+        self.encode(list(ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self,ids,grow=True):
+        ''' Player numbers of *ids*.  Unknown IDs are added, or raise
+        KeyError if *grow* is not set '''
+
+        ids = np.asarray(ids)
+        if not ids.size:
+            return np.empty(ids.shape,np.int64)
+
+        # One dictionary lookup per distinct ID in the chunk, new ones
+        # being taken in order of first appearance
+        uniq,first,inverse = np.unique(ids.ravel(),return_index=True,
+                return_inverse=True)
+        keys = uniq.tolist()
+        codes = np.empty(len(uniq),np.int64)
+        for k in np.argsort(first):
+            key = keys[k]
+            if key not in self._codes:
+                if not grow:
+                    raise KeyError(key)
+                self._codes[key] = len(self.ids)
+                self.ids.append(key)
+            codes[k] = self._codes[key]
+
+        return codes[inverse.ravel()].reshape(ids.shape)
+
+    def decode(self,players):
+        ''' IDs of the given player numbers '''
+
+        return [ self.ids[k] for k in np.asarray(players).ravel() ]
+
+    def save(self,path):
+        with open(path,'w') as f:
+            json.dump({'ids':self.ids},f)
+
+    @classmethod
+    def load(cls,path):
+        with open(path) as f:
+            return cls(json.load(f)['ids'])
+
+def read_csv_log(path,winner=0,loser=1,time=None,delimiter=',',
+        header=False,index=None,parse_time=float,chunksize=CHUNKSIZE):
+    ''' Generate (winners, losers, times) chunks of a CSV log.  Columns
+    *winner*, *loser* and *time* are column numbers, or names if there
+    is a *header*.  IDs are read as strings and numbered by *index*, a
+    PlayerIndex which grows as new players are met.  times is None if
+    there is no *time* column '''
+
+    if index is None:
+        index = PlayerIndex()
+
+    with open(path,newline='') as f:
+        rows = csv.reader(f,delimiter=delimiter)
+
+        if header:
+            names = next(rows)
+            winner,loser = names.index(winner),names.index(loser)
+            if time is not None:
+                time = names.index(time)
+
+        while True:
+            chunk = list(islice(rows,chunksize))
+            if not chunk:
+                break
+
+            # Winner and loser of each game in turn, so that players
+            # are numbered in order of appearance
+            winners,losers = index.encode([ (r[winner],r[loser])
+                for r in chunk ]).T
+            times = None if time is None else \
+                    np.array([ parse_time(r[time]) for r in chunk ])
+
+            yield winners,losers,times
+
+def read_pairs_log(path,index=None,chunksize=CHUNKSIZE):
+    ''' Generate (winners, losers, times) chunks of a binary log.  A .npy
+    file holds an (H,2) integer array of (winner, loser) rows, or (H,3)
+    with times in the last column.  Any other file is raw native int32
+    (winner, loser) pairs.  Either way the file is memory mapped.  The
+    IDs are player numbers as they stand, unless an *index* is given
+    to renumber them '''
+
+    if str(path).endswith('.npy'):
+        log = np.load(path,mmap_mode='r')
+    else:
+        log = np.memmap(path,dtype=np.int32,mode='r').reshape(-1,2)
+
+    if log.ndim != 2 or log.shape[1] not in (2,3):
+        raise ValueError('Expected an (H,2) or (H,3) game log')
+
+    for start in range(0,len(log),chunksize):
+        chunk = np.asarray(log[start:start + chunksize])
+        winners,losers = chunk[:,0],chunk[:,1]
+        times = chunk[:,2] if chunk.shape[1] == 3 else None
+
+        if index is not None:
+            winners,losers = index.encode(chunk[:,:2]).T
+        elif not np.issubdtype(chunk.dtype,np.integer):
+            winners,losers = winners.astype(np.int64),losers.astype(np.int64)
+
+        yield winners,losers,times
+
+def _merge_counts(pairs):
+    ''' Add up (keys, counts) pairs '''
+
+    keys,inverse = np.unique(np.concatenate([ k for k,_ in pairs ]),
+            return_inverse=True)
+    counts = np.bincount(inverse.ravel(),
+            np.concatenate([ c for _,c in pairs ]),minlength=len(keys))
+
+    return keys,counts.astype(np.int64)
+
+def tournament_from_log(chunks,nplayers=None,sparse=True,
+        keep_history=False):
+    ''' Tournament from (winners, losers, times) chunks as made by
+    read_csv_log or read_pairs_log.  Outcomes are a scipy.sparse matrix
+    unless *sparse* is unset.  With *keep_history* the tournament has
+    the history in log order and, if the log has them, the times of the
+    games as attribute `times' '''
+
+    # Played pairs as keys winner*2^32 + loser, with their counts.
+    # Each chunk is counted on its own, and the chunk counts are
+    # merged into the totals only once they are as many as the
+    # totals, so that the totals are not re-sorted for every chunk.
+    keys = np.empty(0,np.int64)
+    counts = np.empty(0,np.int64)
+    pending = []
+    history,times = [],[]
+    nmax = 0
+
+    for winners,losers,t in chunks:
+        winners = np.asarray(winners,np.int64)
+        losers = np.asarray(losers,np.int64)
+        if not winners.size:
+            continue
+        if min(winners.min(),losers.min()) < 0:
+            raise ValueError('Negative player number in log')
+        nmax = max(nmax,winners.max() + 1,losers.max() + 1)
+
+        pending.append(np.unique(winners << 32 | losers,
+            return_counts=True))
+        if sum(len(k) for k,_ in pending) >= len(keys):
+            keys,counts = _merge_counts([(keys,counts)] + pending)
+            pending = []
+
+        if keep_history:
+            history.append(np.column_stack((winners,losers)))
+            if t is not None:
+                times.append(np.asarray(t))
+
+    keys,counts = _merge_counts([(keys,counts)] + pending)
+
+    if nplayers is None:
+        nplayers = int(nmax)
+    elif nplayers < nmax:
+        raise ValueError('Log has more than nplayers players')
+
+    winners,losers = keys >> 32,keys & (2**32 - 1)
+    outcomes = coo_matrix((counts,(winners,losers)),
+            shape=(nplayers,)*2).tocsr()
+    if not sparse:
+        outcomes = outcomes.toarray()
+
+    tournament = UserDefinedTournament(outcomes,keep_history=keep_history)
+
+    if keep_history:
+        dtype = np.int32 if nplayers <= 2**31 else np.int64
+        tournament.history = np.concatenate(history).astype(dtype) \
+                if history else np.empty((0,2),dtype)
+        if times:
+            tournament.times = np.concatenate(times)
+
+    return tournament
+
+# vim: tw=70